@@ -0,0 +1,75 @@
+import math
+from bisect import bisect_right
+
+
+class Clip:
+    """
+    One animation: its frames, how long each is shown and where each is drawn relative to the sprite playing it.
+    Worked out once when the frames are loaded and shared by every sprite that plays the animation,
+    so that the frame for any point in the animation is a lookup.
+    """
+    def __init__(self, frames, frame_time=100, *, loop=True, durations=None):
+        # filled in place when the frames are loaded
+        self.frames = frames
+
+        # how long every frame is shown, in ms, unless each frame is given its own duration
+        self.frame_time = frame_time
+        self.durations = durations
+
+        # whether the animation starts over at the end, or stays on its last frame
+        self.loop = loop
+
+        # size of every frame, and its top left corner relative to the bottom right corner, which stays in place
+        self.sizes = []
+        self.offsets = []
+
+        # time at which every frame ends, and how long the whole animation takes
+        self.ends = []
+        self.length = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def prepare(self):
+        """ Works out the sizes, offsets and timing of the frames. Must be called once the frames are loaded. """
+        durations = self.durations or [self.frame_time] * len(self.frames)
+
+        self.sizes = [frame.get_size() for frame in self.frames]
+        self.offsets = [(-width, -height) for width, height in self.sizes]
+
+        self.ends = []
+        end = 0
+        for duration in durations:
+            end += duration
+            self.ends.append(end)
+        self.length = end
+
+    def frame_at(self, elapsed):
+        """ Index of the frame shown after playing the animation for 'elapsed' ms. """
+        if self.loop:
+            elapsed %= self.length
+
+        return min(bisect_right(self.ends, elapsed), len(self.frames) - 1)
+
+    def start_of(self, index):
+        """ When a frame starts, in ms from the start of the animation. """
+        return self.ends[index - 1] if index else 0
+
+    def passed(self, before, after, index):
+        """ How many times a frame started after 'before' ms of the animation, up to and including 'after' ms. """
+        start = self.start_of(index)
+        if self.loop:
+            return math.floor((after - start) / self.length) - math.floor((before - start) / self.length)
+
+        return int(before < start <= after)
+
+    def finished(self, elapsed):
+        """ Whether an animation that does not loop has played to its end. """
+        return not self.loop and elapsed >= self.length
+
+    def place(self, rect, index):
+        """ Resizes a rect to a frame, keeping its bottom right corner where it was. """
+        right, bottom = rect.bottomright
+        offset_x, offset_y = self.offsets[index]
+        rect.topleft = (right + offset_x, bottom + offset_y)
+        rect.size = self.sizes[index]
@@ -0,0 +1,127 @@
+import os
+import time
+
+import pygame
+
+import constants
+
+
+# whether the mixer started; without a sound card the game plays silently
+enabled = False
+
+# what the mixer was asked for, and what it actually runs at
+settings = {}
+
+# name -> sound effect, and the channel reserved for it so that it never waits for a free one
+effects = {}
+channels = {}
+
+# reserved after the sound effects to time the mixer with
+measuring_channel = None
+
+# ms when the ambience started fading in, or None once it plays at full volume
+ambience_start = None
+
+
+def init(buffer=constants.AUDIO_BUFFER, frequency=constants.AUDIO_FREQUENCY):
+    """ Starts the mixer and loads every sound effect. Returns whether there is sound. """
+    global enabled, measuring_channel
+
+    pygame.mixer.pre_init(frequency, -16, 2, buffer)
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        enabled = False
+        return enabled
+    enabled = True
+
+    actual_frequency, size, channel_count = pygame.mixer.get_init()
+    settings.update(frequency=actual_frequency, buffer=buffer, sample_bytes=abs(size) // 8 * channel_count)
+
+    # a channel for every sound effect and one to measure with, kept away from anything else that plays
+    reserved = len(constants.SOUND_EFFECTS) + 1
+    pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved))
+    pygame.mixer.set_reserved(reserved)
+
+    effects.clear()
+    channels.clear()
+    for number, (name, file_name) in enumerate(constants.SOUND_EFFECTS.items()):
+        effects[name] = pygame.mixer.Sound(os.path.join(constants.SOUNDS_PATH, file_name))
+        channels[name] = pygame.mixer.Channel(number)
+    measuring_channel = pygame.mixer.Channel(reserved - 1)
+
+    return enabled
+
+
+def play(name):
+    """ Plays a sound effect, cutting off the last time it played if it is still playing. """
+    channel = channels.get(name)
+    if channel is not None:
+        channel.play(effects[name])
+
+
+def play_ambience(path=constants.AMBIENCE_PATH):
+    """ Streams the ambience from disk on a loop, fading it in. Returns whether it plays. """
+    global ambience_start
+
+    if not enabled or not os.path.exists(path):
+        return False
+
+    try:
+        pygame.mixer.music.load(path)
+    except pygame.error:
+        return False
+
+    # music.play only takes a fade time from pygame 2 on, so the volume is raised by fade_ambience instead
+    pygame.mixer.music.set_volume(0)
+    pygame.mixer.music.play(-1)
+    ambience_start = pygame.time.get_ticks()
+    return True
+
+
+def fade_ambience():
+    """ Raises the volume of the ambience as it fades in; called once a frame. """
+    global ambience_start
+
+    if ambience_start is None:
+        return
+
+    progress = (pygame.time.get_ticks() - ambience_start) / constants.AMBIENCE_FADE_TIME
+    if progress >= 1:
+        progress = 1
+        ambience_start = None
+    pygame.mixer.music.set_volume(constants.AMBIENCE_VOLUME * progress)
+
+
+def latency(tries=5, length=20):
+    """
+    How long it takes for a sound to be heard, in ms: at least the length of the buffer,
+    plus however late the mixer was measured to be in playing out short silent sounds.
+    """
+    if not enabled:
+        return {}
+
+    buffer_latency = settings['buffer'] / settings['frequency'] * 1000
+
+    # silence of the given length in ms
+    samples = settings['frequency'] * length // 1000
+    silence = pygame.mixer.Sound(buffer=bytes(samples * settings['sample_bytes']))
+
+    delays = []
+    for _ in range(tries):
+        start = time.perf_counter()
+        measuring_channel.play(silence)
+
+        # the mixer only notices that a sound ended once it mixes the next buffer; give up on one that never does
+        while measuring_channel.get_busy() and time.perf_counter() - start < 1:
+            time.sleep(0.0005)
+        delays.append(max((time.perf_counter() - start) * 1000 - length, 0))
+
+    measured_latency = sum(delays) / len(delays)
+    return {
+        'frequency': settings['frequency'],
+        'buffer': settings['buffer'],
+        'buffer_latency': buffer_latency,
+        'measured_latency': measured_latency,
+        'latency': buffer_latency + measured_latency
+    }
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools as it
+from concurrent.futures import ProcessPoolExecutor
+
+import constants
+import bot
+import main
+import displays
+import report
+from report import summarize_outcomes
+
+
+# Display attributes a session can be given
+TUNABLE = ('enemy_spawn_interval', 'enemy_spawn_decay', 'enemy_spawn_interval_min', 'kills_per_step', 'score_multiplier_step')
+
+# stats of an enemy in Display.possible_enemies that a session can change, and where they are in its list
+ENEMY_STATS = {
+    'tier': 4,
+    'speed_x': 5,
+    'speed_y': 6,
+    'y_range': 7,
+    'score': 8,
+    'attack_at': 9,
+    'word_lengths': 10
+}
+
+
+def tuned_display(params):
+    """ A Display class with the parameters of a session in place of its own. """
+    attributes = {name: params[name] for name in TUNABLE if name in params}
+
+    if params.get('enemies'):
+        possible_enemies = {name: list(values) for name, values in displays.Display.possible_enemies.items()}
+        for name, stats in params['enemies'].items():
+            for stat, value in stats.items():
+                possible_enemies[name][ENEMY_STATS[stat]] = tuple(value) if stat in ('y_range', 'word_lengths') else value
+        attributes['possible_enemies'] = possible_enemies
+
+    return type('TunedDisplay', (displays.Display,), attributes)
+
+
+def start_worker(entity_engine):
+    """ Starts pygame once in every worker process. """
+    global view, screen
+    displays.Display.entity_engine = entity_engine
+    view, screen = main.init(headless=True)
+
+
+def run_session(task):
+    """ Plays one game with a typist bot until the player dies or time runs out. """
+    set_index, params, seed, max_time, typist_settings = task
+
+    random.seed(seed)
+    display = tuned_display(params)(view, screen)
+    typist = bot.Typist(**typist_settings, seed=seed)
+
+    # nothing is drawn, since drawing changes nothing in the game
+    while display.player.health > 0 and display.ticks < max_time * 1000:
+        typist.step(display)
+        display.advance(constants.STEP_TIME)
+
+    survival_time = display.ticks / 1000
+    return {
+        'set': set_index,
+        'seed': seed,
+        'died': display.player.health <= 0,
+        'survival_time': survival_time,
+        'score': display.score_text,
+        'kills': display.player.enemies_killed,
+        'kill_rate': display.player.enemies_killed / survival_time * 60 if survival_time else 0,
+        'spawn_interval': display.enemy_spawn_interval
+    }
+
+
+def parameter_sets(args):
+    """ Every combination of the values given on the command line, on top of every set in the parameter file. """
+    base_sets = [{}]
+    if args.params:
+        with open(args.params) as f:
+            base_sets = json.load(f)
+
+    grid = {
+        'enemy_spawn_interval': args.spawn_interval,
+        'enemy_spawn_decay': args.spawn_decay,
+        'score_multiplier_step': args.multiplier_step
+    }
+    grid = {name: values for name, values in grid.items() if values}
+
+    return [dict(base, **dict(zip(grid, values))) for base in base_sets for values in it.product(*grid.values())]
+
+
+def run(sets, sessions, seed, max_time, typist_settings, workers, entity_engine):
+    # every set plays the same seeds, so that differences between sets come from the parameters and not from luck
+    tasks = [(set_index, params, seed + session, max_time, typist_settings)
+             for set_index, params in enumerate(sets) for session in range(sessions)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(entity_engine,)) as executor:
+        chunk_size = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 8))
+        outcomes = list(executor.map(run_session, tasks, chunksize=chunk_size))
+    wall_time = time.perf_counter() - start
+
+    results = []
+    for set_index, params in enumerate(sets):
+        played = [outcome for outcome in outcomes if outcome['set'] == set_index]
+        result = {
+            'params': params,
+            'sessions': len(played),
+            'died': sum(outcome['died'] for outcome in played) / len(played),
+            **{stat: summarize_outcomes([outcome[stat] for outcome in played])
+               for stat in ('survival_time', 'score', 'kills', 'kill_rate', 'spawn_interval')}
+        }
+        results.append(result)
+        print(f"{json.dumps(params):<60} died {result['died']:6.1%}  survived p50 {result['survival_time']['p50']:7.1f} s  "
+              f"score p50 {result['score']['p50']:7.0f}  kills/min {result['kill_rate']['mean']:5.1f}", file=sys.stderr)
+
+    return {
+        'meta': report.meta(sessions=len(tasks), workers=workers or os.cpu_count(), seed=seed, max_time=max_time,
+                            typist=typist_settings, entity_engine=entity_engine, wall_time=wall_time),
+        'sets': results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays many headless games with a typist bot to compare balance parameters.')
+    parser.add_argument('--spawn-interval', type=int, nargs='+', metavar='MS', help='ms between enemy spawns at the start')
+    parser.add_argument('--spawn-decay', type=int, nargs='+', metavar='MS', help='ms taken off the spawn interval every few kills')
+    parser.add_argument('--multiplier-step', type=float, nargs='+', metavar='STEP', help='added to the score multiplier every few kills')
+    parser.add_argument('--params', metavar='PATH',
+                        help='JSON list of parameter sets, each with any of '
+                             f"{', '.join(TUNABLE)} and 'enemies': {{name: {{stat: value}}}} for stats {', '.join(ENEMY_STATS)}")
+    parser.add_argument('--sessions', type=int, default=100, help='games played with every set of parameters')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game of every set; the others count up from it')
+    parser.add_argument('--max-time', type=float, default=600, help='simulated seconds after which a game that is still going is stopped')
+    parser.add_argument('--wpm', type=float, default=40, help='words per minute the typist types')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='chance of any letter the typist types being wrong')
+    parser.add_argument('--reaction-time', type=float, default=0, help='ms before the typist starts on a new word')
+    parser.add_argument('--jitter', type=float, default=0.0, help='how much the time between keys varies, as a fraction of it')
+    parser.add_argument('--workers', type=int, help='processes to play games in, one per core by default')
+    parser.add_argument('--entity-engine', action='store_true', default=constants.ENTITY_ENGINE,
+                        help='step enemies and projectiles in NumPy arrays instead of one sprite at a time')
+    parser.add_argument('--output', '-o', default='-', help='where to write the JSON results, stdout by default')
+    args = parser.parse_args()
+
+    sets = parameter_sets(args)
+    for params in sets:
+        unknown = set(params) - set(TUNABLE) - {'enemies'}
+        for name, stats in params.get('enemies', {}).items():
+            if name not in displays.Display.possible_enemies:
+                unknown.add(name)
+            unknown.update(set(stats) - set(ENEMY_STATS))
+        if unknown:
+            parser.error(f"unknown parameters {', '.join(sorted(unknown))}")
+
+    typist_settings = {
+        'wpm': args.wpm,
+        'error_rate': args.error_rate,
+        'reaction_time': args.reaction_time,
+        'jitter': args.jitter
+    }
+    results = run(sets, args.sessions, args.seed, args.max_time, typist_settings, args.workers, args.entity_engine)
+    report.write(results, args.output)
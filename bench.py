@@ -0,0 +1,144 @@
+import sys
+import time
+import random
+import argparse
+
+import pygame
+
+import constants
+import main
+import displays
+import report
+from report import summarize_times
+
+
+def keep_alive(display):
+    """ Heals the player so that enemies can attack forever without starting the death fade. """
+    if display.player.health < display.player.base_health:
+        display.player.update_health(display.player.base_health - display.player.health)
+
+
+def fill_enemies(count):
+    """ Keeps 'count' live skeletons on screen. """
+    def before_frame(display, frame):
+        keep_alive(display)
+        while len(display.enemies) < count:
+            display.spawn_enemy()
+
+    return before_frame
+
+
+def projectile_volley(count):
+    """ Keeps 'count' arrows in the air, shot by a single ranged skeleton. """
+    def before_frame(display, frame):
+        keep_alive(display)
+        if not display.enemies:
+            # arrows shot from the right edge of the screen would be off screen straight away
+            archer = display.spawn_enemy('Ranged Skeleton')
+            archer.rect.x = constants.SCREEN_WIDTH // 2
+            if display.entities is not None:
+                display.entities.sync(archer)
+
+        archer = next(iter(display.enemies))
+        while len(display.projectiles) < count:
+            display.shoot(archer)
+
+    return before_frame
+
+
+def level_transition(display, frame):
+    """ Keeps switching between the forest and the crypts. """
+    if not display.transition:
+        display.score_text = 4097 if display.current_checkpoint == 2048 else 2049
+
+
+def death_fade(display, frame):
+    """ Kills the player again as soon as the previous death has faded out. """
+    if not display.death and display.player.health > 0:
+        display.player.update_health(-display.player.health)
+
+
+def idle(display, frame):
+    pass
+
+
+# scenario name -> function called before every frame
+SCENARIOS = {
+    'idle': idle,
+    'skeletons_10': fill_enemies(10),
+    'skeletons_100': fill_enemies(100),
+    'skeletons_1000': fill_enemies(1000),
+    'projectile_volley': projectile_volley(200),
+    'level_transition': level_transition,
+    'death_fade': death_fade
+}
+
+
+def run_scenario(view, screen, before_frame, frames, warmup, seed):
+    """ Drives a new display through a scenario, one simulation step per frame, and times update() and draw(). """
+    random.seed(seed)
+    display = displays.Display(view, screen)
+
+    # scenarios decide what is on screen, not the spawn timer, and may want more enemies than there are distinct words
+    display.enemy_spawn_interval = float('inf')
+    display.unique_words = False
+
+    update_times = []
+    draw_times = []
+    for frame in range(warmup + frames):
+        before_frame(display, frame)
+
+        start = time.perf_counter()
+        display.advance(constants.STEP_TIME)
+        updated = time.perf_counter()
+        display.draw()
+        drawn = time.perf_counter()
+
+        display.present()
+
+        if frame >= warmup:
+            update_times.append(updated - start)
+            draw_times.append(drawn - updated)
+
+    return {
+        'frames': frames,
+        'update': summarize_times(update_times),
+        'draw': summarize_times(draw_times)
+    }
+
+
+def run(names, frames, warmup, seed):
+    view, screen = main.init(headless=True)
+
+    results = {}
+    for name in names:
+        results[name] = run_scenario(view, screen, SCENARIOS[name], frames, warmup, seed)
+        print(f"{name:<20} update p50 {results[name]['update']['p50']:7.3f} ms  p99 {results[name]['update']['p99']:7.3f} ms  "
+              f"draw p50 {results[name]['draw']['p50']:7.3f} ms  p99 {results[name]['draw']['p99']:7.3f} ms", file=sys.stderr)
+
+    pygame.quit()
+
+    return {
+        'meta': report.meta(frames=frames, warmup=warmup, seed=seed, entity_engine=displays.Display.entity_engine),
+        'scenarios': results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times update() and draw() of the game loop in fixed scenarios.')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), metavar='scenario',
+                        help=f"scenarios to run, all by default: {', '.join(SCENARIOS)}")
+    parser.add_argument('--frames', type=int, default=300, help='timed frames per scenario')
+    parser.add_argument('--warmup', type=int, default=30, help='untimed frames before timing starts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--entity-engine', action='store_true', default=constants.ENTITY_ENGINE,
+                        help='step enemies and projectiles in NumPy arrays instead of one sprite at a time')
+    parser.add_argument('--output', '-o', default='-', help='where to write the JSON results, stdout by default')
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario '{name}', choose from {', '.join(SCENARIOS)}")
+
+    displays.Display.entity_engine = args.entity_engine
+    report.write(run(args.scenarios, args.frames, args.warmup, args.seed), args.output)
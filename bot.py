@@ -0,0 +1,214 @@
+import os
+import gc
+import sys
+import time
+import random
+import string
+import argparse
+
+import pygame
+
+import constants
+import main
+import helper
+import displays
+import report
+from report import summarize_times
+
+
+class Bot:
+    """
+    Plays the game by handing keys to Display.press_key, as main does for a player.
+    step() is called once per frame before the game advances; the base bot never presses anything.
+    """
+    def step(self, display):
+        pass
+
+
+class Typist(Bot):
+    """
+    Types the word of the closest projectile, or otherwise the closest enemy, like a person would:
+    at a given speed, taking a moment to react to a new word, sometimes hitting the wrong key and deleting it.
+    Keeps its own random numbers, so that it never changes what the game rolls.
+    """
+    def __init__(self, wpm=40, error_rate=0.0, reaction_time=0, jitter=0.0, seed=None):
+        # a word is counted as five keys
+        self.key_time = 60000 / (wpm * 5)
+
+        # chance of any letter being wrong, ms before typing a word that was just picked,
+        # and how much the time between keys varies, as a fraction of it
+        self.error_rate = error_rate
+        self.reaction_time = reaction_time
+        self.jitter = jitter
+
+        self.random = random.Random(seed)
+
+        # game time when the next key is pressed
+        self.next_key = 0
+
+        # word being typed
+        self.word = None
+
+        # keys pressed so far, and how many of them were wrong
+        self.keys = 0
+        self.mistakes = 0
+
+    def choose(self, display):
+        """ The word to type next, or None if there is nothing to type. """
+        # whatever is typed already is kept if a live word starts with it
+        if display.typed_text and display.typed_cursor.candidates:
+            return min(display.word_index.words(display.typed_text))
+
+        for group in (display.projectiles, display.enemies):
+            # enemies already being attacked keep their word until they die
+            live = [sprite for sprite in group if sprite.word_sprite_form and sprite is not display.player.target]
+            if live:
+                return min(live, key=lambda sprite: sprite.rect.x).word
+        return None
+
+    def press(self, display, key):
+        display.press_key(key)
+        self.keys += 1
+
+    def step(self, display):
+        """ Presses every key due by now. """
+        while self.next_key <= display.ticks:
+            self.next_key += self.key_time * (1 + self.random.uniform(-self.jitter, self.jitter))
+
+            # nothing typed while the screen fades counts, so wait for it
+            if display.death or display.transition:
+                self.word = None
+                continue
+
+            # the word was killed, or left the screen, before it was finished
+            if self.word is None or not display.word_index.find(self.word):
+                self.word = self.choose(display)
+                if self.word is not None:
+                    self.next_key = display.ticks + self.reaction_time
+                elif display.typed_text:
+                    # submitting text that matches nothing clears it
+                    self.press(display, 'return')
+                continue
+
+            typed = display.typed_text
+            if not self.word.startswith(typed):
+                self.press(display, 'backspace')
+            elif typed == self.word:
+                self.press(display, 'return')
+                self.word = None
+            else:
+                letter = self.word[len(typed)]
+                if self.random.random() < self.error_rate:
+                    letter = self.random.choice(string.ascii_lowercase.replace(letter, ''))
+                    self.mistakes += 1
+                self.press(display, letter)
+
+
+def memory():
+    """ Memory the process holds right now, in MB, or the most it ever held where that cannot be told. """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # bytes on macOS, kB elsewhere
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def slope(xs, ys):
+    """ Least squares slope of ys over xs. """
+    if len(xs) < 2:
+        return 0.0
+
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread if spread else 0.0
+
+
+def soak(bot, hours, window, seed):
+    """
+    Lets the bot play one long game, drawing every frame, and samples frame times and memory every 'window' frames
+    to see whether either grows the longer the game runs.
+    """
+    view, screen = main.init(headless=True)
+    random.seed(seed)
+    display = displays.Display(view, screen)
+
+    windows = []
+    frame_times = []
+    start = time.perf_counter()
+    try:
+        while time.perf_counter() - start < hours * 3600:
+            frame_start = time.perf_counter()
+            bot.step(display)
+            display.advance(constants.STEP_TIME)
+            display.draw()
+            display.present()
+            frame_times.append(time.perf_counter() - frame_start)
+
+            if len(frame_times) == window:
+                sample = {
+                    'elapsed': time.perf_counter() - start,
+                    'simulated': display.ticks / 1000,
+                    'frame': summarize_times(frame_times),
+                    'memory': memory(),
+                    'objects': len(gc.get_objects()),
+                    'rendered_text': len(helper.rendered_text),
+                    'pooled': sum(len(sprite_pool.free) for sprite_pool in display.pools.values()),
+                    'score': display.score_text,
+                    'kills': display.player.enemies_killed
+                }
+                windows.append(sample)
+                frame_times = []
+                print(f"{sample['elapsed'] / 60:7.1f} min  frame p50 {sample['frame']['p50']:6.3f} ms  "
+                      f"p99 {sample['frame']['p99']:6.3f} ms  memory {sample['memory']:7.1f} MB  "
+                      f"objects {sample['objects']:>8}", file=sys.stderr)
+    except KeyboardInterrupt:
+        # stopping early still reports what was sampled
+        pass
+    pygame.quit()
+
+    hours_elapsed = [sample['elapsed'] / 3600 for sample in windows]
+    drift = {
+        'frame_p50': slope(hours_elapsed, [sample['frame']['p50'] for sample in windows]),
+        'frame_p99': slope(hours_elapsed, [sample['frame']['p99'] for sample in windows]),
+        'memory': slope(hours_elapsed, [sample['memory'] for sample in windows]),
+        'objects': slope(hours_elapsed, [sample['objects'] for sample in windows]),
+        'rendered_text': slope(hours_elapsed, [sample['rendered_text'] for sample in windows]),
+        'pooled': slope(hours_elapsed, [sample['pooled'] for sample in windows])
+    }
+
+    return {
+        'meta': report.meta(seed=seed, window=window, entity_engine=displays.Display.entity_engine,
+                            keys=getattr(bot, 'keys', 0), mistakes=getattr(bot, 'mistakes', 0)),
+
+        # growth per hour of frame times in ms, memory in MB, live objects, cached text renders and pooled sprites
+        'drift': drift,
+        'windows': windows
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lets a typist bot play one long headless game and reports frame time drift and memory growth.')
+    parser.add_argument('--hours', type=float, default=1, help='how long to play for, in wall clock hours')
+    parser.add_argument('--window', type=int, default=constants.TICK_RATE * 60, help='frames per sample')
+    parser.add_argument('--wpm', type=float, default=60, help='words per minute the typist types')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='chance of any letter being wrong')
+    parser.add_argument('--reaction-time', type=float, default=300, help='ms before the typist starts on a new word')
+    parser.add_argument('--jitter', type=float, default=0.3, help='how much the time between keys varies, as a fraction of it')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dirty-rects', action='store_true', default=constants.DIRTY_RECTS,
+                        help='only push the parts of the screen that changed')
+    parser.add_argument('--entity-engine', action='store_true', default=constants.ENTITY_ENGINE,
+                        help='step enemies and projectiles in NumPy arrays instead of one sprite at a time')
+    parser.add_argument('--output', '-o', default='-', help='where to write the JSON results, stdout by default')
+    args = parser.parse_args()
+
+    displays.Display.dirty_rects = args.dirty_rects
+    displays.Display.entity_engine = args.entity_engine
+
+    typist = Typist(args.wpm, args.error_rate, args.reaction_time, args.jitter, args.seed)
+    report.write(soak(typist, args.hours, args.window, args.seed), args.output)
@@ -1,10 +1,46 @@
 import os
 
+# how often the screen is drawn at most; 0 draws as often as the machine can
 FPS = 30
 
+# how often the game is simulated, whatever the frame rate; movement speeds are in pixels per step
+TICK_RATE = 30
+STEP_TIME = 1000 / TICK_RATE
+
+# longest frame that is caught up on, in ms; anything longer slows the game down instead
+MAX_FRAME_TIME = 250
+
 SCREEN_WIDTH = 960
 SCREEN_HEIGHT = 540
 
+# push only the parts of the screen that changed instead of the whole screen every frame
+DIRTY_RECTS = False
+
+# past this many changed parts it is cheaper to push the whole screen
+DIRTY_RECTS_LIMIT = 64
+
+# step enemies and projectiles all at once in NumPy arrays instead of one sprite at a time; needs numpy installed
+ENTITY_ENGINE = False
+
+# threads that decode images; None picks a number based on the number of cores
+ASSET_WORKERS = None
+
+# how many frames the profiler keeps, and how often its overlay is refreshed
+PROFILE_FRAMES = 600
+PROFILE_OVERLAY_INTERVAL = 15
+
+# longest a key may take from being read to being on the screen, in ms, before its frame is flagged as too slow
+KEY_LATENCY_BUDGET = 50
+
+# width of each bar of the key latency histogram in ms, how many bars there are before the one for everything slower,
+# and how many of the last flagged frames are kept
+KEY_LATENCY_BUCKET = 2
+KEY_LATENCY_BUCKETS = 50
+KEY_LATENCY_FLAGGED = 100
+
+# how many rendered text surfaces are kept around for reuse
+TEXT_CACHE_SIZE = 256
+
 DIRECTORY_PATH = os.path.dirname(__file__)
 
 # SPRITES
@@ -21,12 +57,34 @@ RANGED_SKELETON_WALK_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'sprites', 's
 RANGED_SKELETON_ATTACK_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'sprites', 'skelerange', 'skelerange_attack', '')
 RANGED_SKELETON_DEATH_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'sprites', 'skelerange', 'skelerange_death', '')
 
+# WORDS
+WORD_TIERS = ('easy.txt', 'hard.txt')
+
+# how many words to try before accepting one that clashes with a word already on screen
+WORD_SAMPLE_ATTEMPTS = 8
+
 # FONTS
 FONTS_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'fonts', '')
 
 # MUSIC
 SOUNDS_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'sounds', '')
 
+# streamed from disk rather than loaded, and left out if the file is missing
+AMBIENCE_PATH = os.path.join(SOUNDS_PATH, 'dungeon_ambience.wav')
+AMBIENCE_VOLUME = 0.25
+AMBIENCE_FADE_TIME = 5000
+
+# sound effects loaded up front, each played on a channel of its own
+SOUND_EFFECTS = {
+    'keypress': 'keypress_1.wav',
+    'submit': 'keypress_2.wav'
+}
+
+# samples per second, and samples the mixer buffers before they are heard; a smaller buffer plays sounds
+# sooner after a key is pressed, but may crackle on slow machines
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 512
+
 # IMAGES
 IMAGES_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'images', '')
 
@@ -35,5 +93,11 @@ CASTLE_BACKGROUND_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'backgrounds', '
 FOREST_BACKGROUND_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'backgrounds', 'forest', '')
 CRYPTS_BACKGROUND_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'backgrounds', 'crypts', '')
 
+# how far below the next level's score its background starts loading
+BACKGROUND_PREFETCH_DISTANCE = 512
+
+# raw pixels of every image, built by running 'python resources.py build'; loose files are used if it is missing
+ASSET_PACK_PATH = os.path.join(DIRECTORY_PATH, 'assets.pack')
+
 # ICON
 ICON_PATH = os.path.join(DIRECTORY_PATH, 'assets', 'icon.png')
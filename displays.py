@@ -7,6 +7,13 @@ import constants
 import helper
 import player
 import enemy
+import words
+import pool
+import entities
+import hud
+import profiler
+import latency
+import audio
 
 
 class Display:
@@ -23,45 +30,66 @@ class Display:
     # fill surface with transition color (black)
     fade_surface.fill(pygame.color.Color('Black'))
 
-    # manages enemy spawns
+    # manages enemy spawns; every few kills enemies spawn more often, down to a minimum interval
     enemy_spawn_interval = 4096
-    enemy_spawn_call_time = pygame.time.get_ticks()
+    enemy_spawn_call_time = 0
+    enemy_spawn_decay = 25
+    enemy_spawn_interval_min = 1000
+
+    # how many kills it takes for the game to get harder, and how much more score each enemy is worth after that
+    kills_per_step = 5
+    score_multiplier_step = 0.25
 
     # manages type of enemies and their attributes
     possible_enemies = {
-        'Melee Skeleton':  ['Melee', helper.melee_skeleton_walk_frames, helper.melee_skeleton_attack_frames, helper.melee_skeleton_death_frames, 'hard.txt', -2, 0, (240, 320), 32, 4],
-        'Ranged Skeleton':  ['Ranged', helper.ranged_skeleton_walk_frames, helper.ranged_skeleton_attack_frames, helper.ranged_skeleton_death_frames, 'hard.txt', -2, 0, (240, 320), 32, 4],
+        'Melee Skeleton':  ['Melee', helper.melee_skeleton_walk, helper.melee_skeleton_attack, helper.melee_skeleton_death, 'hard.txt', -2, 0, (240, 320), 32, 4, (5, 7)],
+        'Ranged Skeleton':  ['Ranged', helper.ranged_skeleton_walk, helper.ranged_skeleton_attack, helper.ranged_skeleton_death, 'hard.txt', -2, 0, (240, 320), 32, 4, (6, 8)],
     }
 
-    # time since last call of clock.tick()
+    # words on screen never clash with each other, so that every submit matches one word at most
+    unique_words = True
+
+    # time of a single simulation step, in ms; the game always steps at constants.TICK_RATE however often it is drawn
     time = 0
 
-    # displacement of screen for shake
+    # time that has passed but has not been simulated yet
+    accumulator = 0
+
+    # game time in ms, the sum of every 'time' so far; used instead of the wall clock so the game can run headless
+    ticks = 0
+
+    # displacement of screen for shake; advanced once per simulation step
     offset = it.repeat((0, 0))
+    shake_offset = (0, 0)
+    last_offset = (0, 0)
+
+    # only push the parts of the screen that changed to the window, instead of flipping all of it
+    dirty_rects = constants.DIRTY_RECTS
+
+    # step enemies and projectiles all at once in arrays instead of one sprite at a time; needs numpy
+    entity_engine = constants.ENTITY_ENGINE
 
     def __init__(self, view, screen):
         # the surface of the screen + the screen
         self.view = view
         self.screen = screen
 
-        # all backgrounds for all levels; add to this list if adding new levels
-        self.backgrounds = [
-            helper.Background(constants.CASTLE_BACKGROUND_PATH),
-            helper.Background(constants.FOREST_BACKGROUND_PATH),
-            helper.Background(constants.CRYPTS_BACKGROUND_PATH)
-        ]
-
-        # score needed for next level; add to this dictionary if adding new levels
+        # background folder of each level and the score needed to reach it; add to this dictionary if adding new levels
         self.backgrounds_checkpoints = {
-            0: self.backgrounds[0],
-            2048: self.backgrounds[1],
-            4096: self.backgrounds[2]
+            0: constants.CASTLE_BACKGROUND_PATH,
+            2048: constants.FOREST_BACKGROUND_PATH,
+            4096: constants.CRYPTS_BACKGROUND_PATH
         }
 
+        # backgrounds are only loaded once they are needed, or once the player gets close to their level
+        self.loaded_backgrounds = {}
+        self.background_handles = {}
+
         self.current_checkpoint = 0
 
         # current background based on current level
-        self.background = self.backgrounds[self.current_checkpoint]
+        self.background_checkpoint = self.current_checkpoint
+        self.background = self.get_background(self.background_checkpoint)
 
         # the player
         self.player = player.Player()
@@ -70,28 +98,45 @@ class Display:
         self.player_sf = pygame.sprite.GroupSingle()
         self.player_sf.add(self.player)
 
+        # words of every live enemy and projectile, kept up to date by their groups
+        self.word_index = words.WordIndex()
+
+        # enemies, projectiles and scores that left the screen are kept to be used again; each pool grows to the most used at once
+        self.pools = {sprite_class: pool.Pool(sprite_class) for sprite_class in (enemy.Melee, enemy.Ranged, enemy.Projectile, helper.Score)}
+
+        # steps enemies and projectiles if enabled, otherwise they update themselves
+        self.entities = entities.EntityEngine(self) if self.entity_engine else None
+
         # projectiles on the screen
-        self.projectiles = pygame.sprite.Group()
+        self.projectiles = helper.WordGroup(self.word_index)
 
         # displays added scores of dead enemies
         self.score_indicators = pygame.sprite.Group()
 
         # all enemies
-        self.enemies = pygame.sprite.Group()
+        self.enemies = helper.WordGroup(self.word_index)
         self.dead_enemies = pygame.sprite.Group()
 
         # player kills enemies and gets a higher score
         self.score_text = 0
-        self.score_text_sprite = self.get_score_text()
 
         # the more enemies killed the more score each new enemy gives
         self.score_multiplier_text = 1
-        self.score_multiplier_text_sprite = self.get_score_multiplier_text()
+
+        # healthbar, score and multiplier, only redrawn when they change
+        self.hud = hud.Hud(self)
 
         # player answers
         self.typed_text = ''
         self.typed_text_sprite = self.get_typed_text()
 
+        # follows the typed text through the word index
+        self.typed_cursor = self.word_index.cursor()
+
+        # read every word list now so that spawning never touches the disk
+        for tier in constants.WORD_TIERS:
+            words.bank.load(tier)
+
         # sets display attribute for other classes
         player.Player.display = self
         helper.Score.display = self
@@ -99,9 +144,18 @@ class Display:
         enemy.Enemy.display = self
         enemy.Projectile.display = self
 
-        # all level sounds
-        self.keypress_basic = pygame.mixer.Sound(constants.SOUNDS_PATH + '\keypress_1.wav')
-        self.keypress_submit = pygame.mixer.Sound(constants.SOUNDS_PATH + '\keypress_2.wav')
+        # what was drawn this frame and the frame before; both have to be pushed when using dirty rects
+        self.drawn_rects = []
+        self.dirty = []
+
+        # the whole screen has to be pushed if the background moved or nothing has been pushed yet
+        self.full_redraw = True
+
+        # times every phase of a frame when enabled
+        self.profiler = profiler.FrameProfiler()
+
+        # times every key from being read until it is on the screen when enabled
+        self.latency = latency.KeyTracer()
 
     def reset(self):
         """ Screen fades on death with reset stats. """
@@ -123,20 +177,29 @@ class Display:
                 # fade in immediately
                 self.faded = True
 
+                # let go of whatever the last level needed more of than it is likely to need again
+                for sprite_pool in self.pools.values():
+                    sprite_pool.trim()
+
                 # IF the player died reset all stats
                 if self.death:
                     # reset all text
                     self.score_text = 0
                     self.score_multiplier_text = 1
                     self.typed_text = ''
-                    self.score_text_sprite = self.get_score_text()
-                    self.score_multiplier_text_sprite = self.get_score_multiplier_text()
-                    self.typed_text_sprite = self.get_typed_text()
+                    self.typed_text_sprite.sprite.clear()
+                    self.typed_cursor.clear()
 
                     # reset all enemies
-                    self.enemies.empty()
-                    self.projectiles.empty()
-                    self.dead_enemies.empty()
+                    if self.entities is not None:
+                        self.entities.clear()
+                    for group in (self.enemies, self.projectiles, self.dead_enemies):
+                        sprites = group.sprites()
+                        group.empty()
+                        self.release(*sprites)
+
+                    # enemies spawn as slowly as at the start again
+                    self.enemy_spawn_interval = type(self).enemy_spawn_interval
 
                     # reset player health
                     self.player.health = 0
@@ -144,13 +207,37 @@ class Display:
 
                 # If the background is transitioning to a new one
                 elif self.transition:
-                    self.background = self.backgrounds_checkpoints[self.current_checkpoint]
+                    # the previous level will not be seen again, so let go of it
+                    self.loaded_backgrounds.pop(self.background_checkpoint, None)
+                    self.background_checkpoint = self.current_checkpoint
+                    self.background = self.get_background(self.background_checkpoint)
 
                     self.typed_text = ''
-                    self.typed_text_sprite = self.get_typed_text()  # DO YOU NEED THIS?
+                    self.typed_text_sprite.sprite.clear()
+                    self.typed_cursor.clear()
 
         self.fade_surface.set_alpha(self.fade_alpha)
 
+    def get_background(self, checkpoint):
+        """ Returns the background of a level, loading it if it has not been loaded yet. """
+        if checkpoint not in self.loaded_backgrounds:
+            self.loaded_backgrounds[checkpoint] = helper.Background(self.backgrounds_checkpoints[checkpoint])
+            self.background_handles.pop(checkpoint, None)
+
+        return self.loaded_backgrounds[checkpoint]
+
+    def prefetch_background(self, checkpoint):
+        """ Decodes the background of a level on worker threads, and prepares it once every layer has decoded. """
+        if checkpoint in self.loaded_backgrounds:
+            return
+
+        handles = self.background_handles.get(checkpoint)
+        if handles is None:
+            self.background_handles[checkpoint] = helper.Background.prefetch(self.backgrounds_checkpoints[checkpoint])
+        elif all(handle.done() for handle in handles):
+            # nothing left to wait for, so this only converts and darkens the layers
+            self.get_background(checkpoint)
+
     def shake(self):
         """ Generator returning offset of screen, creating a 'shake' effect. """
         shake_direction = -1
@@ -167,45 +254,22 @@ class Display:
         while True:
             yield (0, 0)
 
-    @staticmethod
-    def generate_word(filename):
-        """ Generates random word for enemies. """
-        with open(filename, 'r') as f:
-            contents_of_file = f.read()
-
-        lines = contents_of_file.splitlines()
-        line_number = random.randint(0, len(lines) - 1)
-        return lines[line_number]
-
-    def get_score_text(self):
-        score_text_sprite = helper.Text(f'score: {self.score_text}',
-                                        constants.FONTS_PATH + '8bitoperator.ttf',
-                                        pygame.color.Color('White'),
-                                        24,
-                                        640, 72,
-                                        orientation='topleft')
-        score_text = pygame.sprite.GroupSingle()
-        score_text.add(score_text_sprite)
-        return score_text
-
-    def get_score_multiplier_text(self):
-        score_multiplier_text_sprite = helper.Text(f'x{self.score_multiplier_text}',
-                                                   constants.FONTS_PATH + '8bitoperator.ttf',
-                                                   pygame.color.Color('White'),
-                                                   24,
-                                                   640, 108,
-                                                   orientation='topleft')
-        score_multiplier_text = pygame.sprite.GroupSingle()
-        score_multiplier_text.add(score_multiplier_text_sprite)
-        return score_multiplier_text
+    def toggle_overlay(self):
+        """ Shows or hides the profiler overlay. """
+        self.profiler.toggle_overlay()
+
+        # a hidden overlay is only erased by pushing the whole screen once
+        self.full_redraw = True
+
+    def generate_word(self, filename, lengths=None):
+        """ Generates random word for enemies that does not clash with any word already on screen; None if there is none. """
+        return words.bank.sample(filename, lengths, avoid=self.word_index if self.unique_words else None)
 
     def get_typed_text(self):
-        typed_text_sprite = helper.Text(self.typed_text,
-                                        constants.FONTS_PATH + '8bitoperator.ttf',
-                                        pygame.color.Color('White'),
-                                        48,
-                                        constants.SCREEN_WIDTH / 2, constants.SCREEN_HEIGHT / 2,
-                                        orientation='center')
+        typed_text_sprite = helper.InputLine(constants.FONTS_PATH + '8bitoperator.ttf',
+                                             pygame.color.Color('White'),
+                                             48,
+                                             constants.SCREEN_WIDTH / 2, constants.SCREEN_HEIGHT / 2)
         typed_text = pygame.sprite.GroupSingle()
         typed_text.add(typed_text_sprite)
         return typed_text
@@ -216,63 +280,137 @@ class Display:
         if not (self.death or self.transition):
             # manage player input
             if key == 'return':   # submit typed_text, if it matches with enemies the enemies are deleted
-                self.keypress_submit.play()
-                for enemy in self.enemies:
-                    if enemy.word == self.typed_text:
-                        self.player.target = enemy
-                        break
+                audio.play('submit')
+                matches = self.word_index.find(self.typed_text)
 
-                for projectile in self.projectiles:
-                    if projectile.word == self.typed_text:
-                        self.player.target = projectile
+                # projectiles take priority over enemies, otherwise the oldest match is targeted
+                for match in matches:
+                    if isinstance(match, enemy.Projectile):
+                        self.player.target = match
                         break
+                else:
+                    if matches:
+                        self.player.target = matches[0]
 
                 self.typed_text = ''
+                self.typed_text_sprite.sprite.clear()
+                self.typed_cursor.clear()
             elif key == 'backspace':  # delete last letter in string
-                self.keypress_basic.play()
+                audio.play('keypress')
                 self.typed_text = self.typed_text[:-1]
+                self.typed_text_sprite.sprite.pop()
+                self.typed_cursor.pop()
             else:
-                self.keypress_basic.play()
+                audio.play('keypress')
                 self.typed_text += key
+                self.typed_text_sprite.sprite.append(key)
+                self.typed_cursor.push(key)
+
+            self.latency.handled()
+        else:
+            self.latency.dropped()
 
-            self.typed_text_sprite = self.get_typed_text()
+    def spawn_enemy(self, enemy_key=None):
+        """ Creates a random enemy, or the one given, at the right edge of the screen. """
+        if enemy_key is None:
+            enemy_key = random.choice(tuple(self.possible_enemies.keys()))
+        enemy_values = self.possible_enemies[enemy_key]
+
+        # every word of the tier clashes with one on screen, so the enemy waits for the next spawn
+        word = self.generate_word(enemy_values[4], enemy_values[10])
+        if word is None:
+            return None
+
+        # create an enemy with the given attributes
+        class_name = getattr(enemy, enemy_values[0])
+
+        enemy_sprite = self.pools[class_name].acquire(
+            enemy_values[1],     # walk animation
+            enemy_values[2],     # attack animation
+            enemy_values[3],     # death animation
+            word,                # word, from the tier and word lengths
+            enemy_values[5],     # speed x
+            enemy_values[6],     # speed y
+            enemy_values[7][0],  # y range 1
+            enemy_values[7][1],  # y range 2
+            enemy_values[8],     # score
+            enemy_values[9]      # attack at
+        )
+
+        self.enemies.add(enemy_sprite)
+        if self.entities is not None:
+            self.entities.add(enemy_sprite)
+        return enemy_sprite
+
+    def shoot(self, skeleton):
+        """ Fires a projectile from a skeleton, unless every word it could have clashes with one on screen. """
+        word = self.generate_word(enemy.Projectile.tier, enemy.Projectile.word_lengths)
+        if word is None:
+            return None
+
+        projectile = self.pools[enemy.Projectile].acquire(skeleton, word)
+        self.projectiles.add(projectile)
+        if self.entities is not None:
+            self.entities.add(projectile)
+        return projectile
+
+    def release(self, *sprites):
+        """ Hands sprites that have left the game back to their pools. """
+        for sprite in sprites:
+            sprite_pool = getattr(sprite, 'pool', None)
+            if sprite_pool is None:
+                continue
+
+            # the player only takes the word of its target once it strikes, so a target still to be struck is never reused
+            if sprite is self.player.target and sprite.word_sprite_form:
+                sprite_pool.discard(sprite)
+            else:
+                sprite_pool.release(sprite)
+
+    def advance(self, frame_time):
+        """ Simulates as many fixed steps as fit in the time that has passed. Returns how many were run. """
+        # a very long frame (e.g. the window being dragged) would otherwise take forever to catch up on
+        self.accumulator += min(frame_time, constants.MAX_FRAME_TIME)
+
+        steps = 0
+        while self.accumulator >= constants.STEP_TIME:
+            self.time = constants.STEP_TIME
+            self.ticks += self.time
+            self.update()
+
+            self.accumulator -= constants.STEP_TIME
+            steps += 1
+
+        return steps
 
     def update(self):
-        """ Updates everything. """
+        """ Updates everything by one simulation step. """
         # checks fade to black
         self.reset()
+        self.profiler.mark('update.reset')
 
         # updates all things on the screen
         self.player_sf.update()
-        self.enemies.update()
-        self.projectiles.update()
-        self.dead_enemies.update()
+        self.profiler.mark('update.player')
+        if self.entities is not None:
+            self.entities.step()
+            self.profiler.mark('update.entities')
+        else:
+            self.enemies.update()
+            self.profiler.mark('update.enemies')
+            self.projectiles.update()
+            self.profiler.mark('update.projectiles')
+            self.dead_enemies.update()
+            self.profiler.mark('update.dead_enemies')
         self.score_indicators.update()
-        self.score_text_sprite.update()
+        self.hud.update()
+        self.profiler.mark('update.text')
 
         # spawns enemies
-        if pygame.time.get_ticks() - self.enemy_spawn_call_time >= self.enemy_spawn_interval:
-            enemy_key = random.choice(tuple(self.possible_enemies.keys()))
-            enemy_values = self.possible_enemies[enemy_key]
-
-            # create an enemy with the given attributes
-            class_name = getattr(enemy, enemy_values[0])
-            
-            enemy_sprite = class_name(
-                enemy_values[1],     # walk path
-                enemy_values[2],     # attack path
-                enemy_values[3],     # death path
-                enemy_values[4],     # tier
-                enemy_values[5],     # speed x
-                enemy_values[6],     # speed y
-                enemy_values[7][0],  # y range 1
-                enemy_values[7][1],  # y range 2
-                enemy_values[8],     # score
-                enemy_values[9]      # attack at
-            )
-
-            self.enemies.add(enemy_sprite)
-            self.enemy_spawn_call_time = pygame.time.get_ticks()
+        if self.ticks - self.enemy_spawn_call_time >= self.enemy_spawn_interval:
+            self.spawn_enemy()
+            self.enemy_spawn_call_time = self.ticks
+        self.profiler.mark('update.spawn')
 
         # reverse to check the highest scores first
         for checkpoint in reversed(list(self.backgrounds_checkpoints.keys())):
@@ -280,48 +418,132 @@ class Display:
                 self.current_checkpoint = checkpoint
 
                 # transition if it's not the current background
-                if self.background != self.backgrounds_checkpoints[self.current_checkpoint]:
+                if self.background_checkpoint != self.current_checkpoint:
                     self.transition = True
 
                 # do not check further when a score has been met - it is guaranteed to be the highest one
                 break
 
+        # load the level being faded to, or the next level once the score gets close to it
+        if self.transition:
+            self.prefetch_background(self.current_checkpoint)
+        else:
+            upcoming = [checkpoint for checkpoint in self.backgrounds_checkpoints if checkpoint > self.background_checkpoint]
+            if upcoming and self.score_text >= min(upcoming) - constants.BACKGROUND_PREFETCH_DISTANCE:
+                self.prefetch_background(min(upcoming))
+        self.profiler.mark('update.levels')
+
+        # the whole screen changes when the background scrolls
+        if self.background.parallax():
+            self.full_redraw = True
+
+        self.shake_offset = next(self.offset)
+        self.profiler.mark('update.parallax')
+
+        # hand the sprites their new frames and positions for drawing
+        if self.entities is not None:
+            self.entities.apply()
+            self.profiler.mark('update.apply')
+
+    def mark_dirty(self, *groups):
+        """ Remembers where the sprites of the groups were drawn this frame. """
+        for group in groups:
+            for sprite in group:
+                self.drawn_rects.append(sprite.rect.copy())
+
     def draw(self):
         """ Draws everything. """
-        self.background.parallax()
-        self.background.layers.draw(self.screen)
+        self.background.draw(self.screen)
+        self.profiler.mark('draw.background')
 
-        # draws player and player healthbar
-        self.player.healthbar.draw(self.screen)
+        # draws player
         self.player_sf.draw(self.screen)
+        self.profiler.mark('draw.player')
 
         for projectile in self.projectiles:
             projectile.word_sprite_form.draw(self.screen)
 
         for enemy_sprite in self.enemies:
             enemy_sprite.word_sprite_form.draw(self.screen)
+        self.profiler.mark('draw.words')
 
         # draws all enemies, both dead and alive
         self.enemies.draw(self.screen)
         self.dead_enemies.draw(self.screen)
+        self.profiler.mark('draw.enemies')
 
         # draws enemy stuff
         self.score_indicators.draw(self.screen)
 
         # draws the projectiles on the screen
         self.projectiles.draw(self.screen)
+        self.profiler.mark('draw.projectiles')
 
         # draw slash effect for a moment
+        slash_rects = []
         for enemy_sprite in self.dead_enemies:
             if not enemy_sprite.slashed:
                 y_offset = enemy_sprite.slash_rect.h - enemy_sprite.rect.h
-                self.screen.blit(enemy_sprite.slash_image, (enemy_sprite.rect.x - enemy_sprite.slash_rect.w, enemy_sprite.rect.y - y_offset / 2))
+                slash_rects.append(self.screen.blit(enemy_sprite.slash_image, (enemy_sprite.rect.x - enemy_sprite.slash_rect.w, enemy_sprite.rect.y - y_offset / 2)))
                 enemy.slashed = True
+        self.profiler.mark('draw.slash')
 
         # draws all static text in the level
         self.typed_text_sprite.draw(self.screen)
-        self.score_text_sprite.draw(self.screen)
-        self.score_multiplier_text_sprite.draw(self.screen)
+
+        # drawn every frame but only pushed when it changed, sprites passing over it push what they cover
+        if self.hud.changed:
+            hud_rects = [self.hud.rect.copy()]
+        else:
+            hud_rects = []
+        self.hud.draw(self.screen)
+        self.profiler.mark('draw.text')
 
         # black screen that is by default fully transparent unless fade is active
         self.screen.blit(self.fade_surface, (0, 0))
+        self.profiler.mark('draw.fade')
+
+        # drawn last so that it is never faded out
+        if self.profiler.overlay:
+            self.profiler.draw(self.screen)
+            self.full_redraw = True
+            self.profiler.mark('draw.overlay')
+
+        if self.dirty_rects:
+            # what was drawn last frame has to be pushed again to erase it
+            previous_rects = self.drawn_rects
+            self.drawn_rects = slash_rects + hud_rects
+
+            self.mark_dirty(self.player_sf, self.enemies, self.dead_enemies,
+                            self.score_indicators, self.projectiles, self.typed_text_sprite)
+            for sprite in it.chain(self.projectiles, self.enemies):
+                self.mark_dirty(sprite.word_sprite_form)
+
+            self.dirty = previous_rects + self.drawn_rects
+
+            # the whole screen changes while the screen fades
+            self.full_redraw = self.full_redraw or self.fade_alpha > 0 or \
+                len(self.dirty) > constants.DIRTY_RECTS_LIMIT
+            self.profiler.mark('draw.dirty_rects')
+
+        self.latency.drawn()
+
+    def present(self):
+        """ Pushes the drawn screen to the window. """
+        offset = self.shake_offset
+
+        # a shaking screen moves everything, including the frame after the shake stops
+        if not self.dirty_rects or self.full_redraw or offset != (0, 0) or self.last_offset != (0, 0):
+            self.view.blit(self.screen, offset)
+            self.profiler.mark('present.blit')
+            pygame.display.flip()
+        else:
+            for rect in self.dirty:
+                self.view.blit(self.screen, rect, rect)
+            self.profiler.mark('present.blit')
+            pygame.display.update(self.dirty)
+        self.profiler.mark('present.flip')
+        self.latency.flipped()
+
+        self.last_offset = offset
+        self.full_redraw = False
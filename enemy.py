@@ -4,30 +4,36 @@ import pygame
 
 import constants
 import helper
+import resources
 
 
 class Enemy(pygame.sprite.Sprite):
     """ Base class for all enemy types. """
     display = None
 
-    # time elapsed for constant animation speed
-    time_elapsed = 0
-
-    # how fast the sprite updates
-    loop_interval = 100  # 0.1 s
-
     # movement speeds
     change_x = 0
     change_y = 0
 
-    def __init__(self, score, tier):
+    # where the entity engine keeps the enemy, if it is used
+    slot = None
+
+    def __init__(self, *args):
         super().__init__()
+        # word on top of the enemy; the sprite is kept for the next life of the enemy when it is pooled
+        self.word_sprite = None
+        self.word_sprite_form = pygame.sprite.GroupSingle()
+
+        self.spawn(*args)
+
+    def spawn(self, score, word):
+        """ Sets up everything that changes from one life of the enemy to the next. """
         # how much the enemy is worth
         self.score = score
 
         # word on top of the enemy
-        self.word = self.display.generate_word(tier)
-        self.word_sprite_form = self.get_text_sprite()
+        self.word = word
+        self.set_text_sprite()
 
     def move(self):
         # move the enemy
@@ -39,26 +45,31 @@ class Enemy(pygame.sprite.Sprite):
             word.rect.x += self.change_x
             word.rect.y += self.change_y
 
-    def get_text_sprite(self):
-        """ Creates sprite form of word for enemies. """
-        text_sprite = helper.Text(self.word,
-                                  constants.FONTS_PATH + '8bitoperator.ttf',
-                                  pygame.color.Color('White'),
-                                  18,
-                                  self.rect.x + self.rect.w / 2, self.rect.y,
-                                  orientation='center')
-        text_group = pygame.sprite.GroupSingle()
-        text_group.add(text_sprite)
-        return text_group
+    def set_text_sprite(self):
+        """ Puts the word over the enemy, reusing the sprite of its last life if it had one. """
+        x, y = self.rect.x + self.rect.w / 2, self.rect.y
+        if self.word_sprite is None:
+            self.word_sprite = helper.Text(self.word,
+                                           constants.FONTS_PATH + '8bitoperator.ttf',
+                                           pygame.color.Color('White'),
+                                           18,
+                                           x, y,
+                                           orientation='center')
+        else:
+            self.word_sprite.word = self.word
+            self.word_sprite.x, self.word_sprite.y = x, y
+            self.word_sprite.image, self.word_sprite.rect = self.word_sprite.get_text()
+
+        self.word_sprite_form.add(self.word_sprite)
 
     def create_score_indicator(self):
         """ Score that pops up around enemy on death. """
-        text_sprite = helper.Score(f'{int(self.score * self.display.score_multiplier_text)}',
-                                   constants.FONTS_PATH + '8bitoperator.ttf',
-                                   pygame.color.Color('White'),
-                                   18,
-                                   self.rect.x, self.rect.y,
-                                   orientation='center')
+        text_sprite = self.display.pools[helper.Score].acquire(f'{int(self.score * self.display.score_multiplier_text)}',
+                                                               constants.FONTS_PATH + '8bitoperator.ttf',
+                                                               pygame.color.Color('White'),
+                                                               18,
+                                                               self.rect.x, self.rect.y,
+                                                               orientation='center')
         text_sprite.enemy = self
         self.display.score_indicators.add(text_sprite)
 
@@ -66,31 +77,36 @@ class Enemy(pygame.sprite.Sprite):
         """ Player enemy death animation. """
         self.display.player.enemies_killed += 1
 
-        # word is no longer visible above the enemy when dead
+        # word is no longer visible above the enemy when dead, and can no longer be typed
         self.word_sprite_form.empty()
+        self.display.word_index.discard(self)
 
         # for every fifth enemy killed
-        if self.display.player.enemies_killed % 5 == 0:
+        if self.display.player.enemies_killed % self.display.kills_per_step == 0:
             # players should get more score per enemy killed
-            self.display.score_multiplier_text += 0.25
-            self.display.score_multiplier_text_sprite = self.display.get_score_multiplier_text()
+            self.display.score_multiplier_text += self.display.score_multiplier_step
 
-            # enemy spawn rate should increase, cap it out at 1000 ms
-            if not self.display.enemy_spawn_interval >= 1000:
-                self.display.enemy_spawn_interval -= 25
+            # enemy spawn rate should increase, cap it out at 1000 ms without raising an interval already below it
+            interval = self.display.enemy_spawn_interval
+            self.display.enemy_spawn_interval = max(interval - self.display.enemy_spawn_decay,
+                                                    min(interval, self.display.enemy_spawn_interval_min))
 
         # amount of score gained above enemy after death, update this to screen
         self.create_score_indicator()
 
 
 class Projectile(Enemy):
-    def __init__(self, enemy):
+    # image of the projectile, shared by all of them
+    image = pygame.Surface((0, 0))
+
+    # where its words come from, and how long they are; short, since they come at the player fast
+    tier = 'easy.txt'
+    word_lengths = (2, 3)
+
+    def spawn(self, enemy, word):
         # enemy that shot the projectile
         self.enemy = enemy
 
-        # image of the projectile
-        self.image = pygame.Surface((0, 0))
-
         # rect of the projectile
         self.rect = self.image.get_rect()
 
@@ -98,10 +114,11 @@ class Projectile(Enemy):
         self.rect.x = self.enemy.rect.x + 32  # x point of arrow on sprite image
         self.rect.y = self.enemy.rect.y + 64  # y point of arrow on sprite image
 
-        # set speed, change_x and change_y are by default 0
+        # set speed; a pooled projectile may still be flying off from its last life
         self.change_x = -8
+        self.change_y = 0
 
-        super().__init__(8, "easy.txt")
+        super().spawn(8, word)
 
     def update(self):
         # move the enemy
@@ -111,10 +128,12 @@ class Projectile(Enemy):
         if self.rect.x + self.rect.w <= self.display.player.rect.x + self.display.player.rect.w:
             self.display.player.update_health(-1)
             self.display.projectiles.remove(self)
+            self.display.release(self)
 
         # if the player cannot see the projectile anymore
         if self.rect.x + self.rect.w >= constants.SCREEN_WIDTH or self.rect.y - self.rect.h <= 0:
             self.display.projectiles.remove(self)
+            self.display.release(self)
 
     def dead(self):
         """ Projectile gets knocked away. """
@@ -122,25 +141,29 @@ class Projectile(Enemy):
         self.change_x = random.randint(64, 80)
         self.change_y = -random.randint(48, 64)
 
+        if self.display.entities is not None:
+            self.display.entities.sync(self)
+
 
 class Skeleton(Enemy):
     """ Base class for all enemy types. """
-    # current frame
-    move_frame = 0
-    attack_frame = 0
-    death_frame = 0
+    # how long each animation has been played for, in ms
+    move_time = 0
+    attack_time = 0
+    death_time = 0
 
     # currently doing - moving is the default frame
     is_dying = False
     is_attacking = False
 
-    def __init__(self, walk_path, attack_path, die_path, tier, speed_x, speed_y, first_y, second_y, score, attack_at):
+    def spawn(self, walk_clip, attack_clip, death_clip, word, speed_x, speed_y, first_y, second_y, score, attack_at):
+        # frame of the attack animation that hits
         self.attack_at = attack_at
 
-        # frame management
-        self.move_frames = walk_path
-        self.attack_frames = attack_path
-        self.death_frames = die_path
+        # animations, shared with every other enemy of the same type
+        self.move_clip = walk_clip
+        self.attack_clip = attack_clip
+        self.death_clip = death_clip
 
         # how fast the enemy moves
         self.speed_x = speed_x
@@ -148,8 +171,15 @@ class Skeleton(Enemy):
         self.change_x = self.speed_x
         self.change_y = self.speed_y
 
+        # start every animation over, as a pooled enemy may have died halfway through one
+        self.move_time = 0
+        self.attack_time = 0
+        self.death_time = 0
+        self.is_dying = False
+        self.is_attacking = False
+
         # currently the starting frame -> this will change as the game runs
-        self.image = self.move_frames[self.move_frame]
+        self.image = self.move_clip.frames[0]
 
         # gets rect of image
         self.rect = self.image.get_rect()
@@ -157,11 +187,11 @@ class Skeleton(Enemy):
         self.rect.y = random.randint(first_y, second_y)  # depends on if enemy is flying or on the ground
 
         # momentary slash effect displayed on death
-        self.slash_image = pygame.image.load(constants.IMAGES_PATH + 'slash.png').convert_alpha()
+        self.slash_image = resources.load_image(constants.IMAGES_PATH + 'slash.png')
         self.slash_rect = self.slash_image.get_rect()
         self.slashed = False
 
-        super().__init__(score, tier)
+        super().spawn(score, word)
 
     def dead(self):
         """ Player enemy death animation. """
@@ -172,34 +202,28 @@ class Skeleton(Enemy):
         self.change_x = random.randint(64, 80)
         self.change_y = random.randint(48, 64) * -1
 
+        if self.display.entities is not None:
+            self.display.entities.sync(self)
+
     def loop_animation(self):
-        """ Advances the animation. """
-        self.time_elapsed += self.display.time
-        while self.time_elapsed > self.loop_interval:
-            if self.is_dying:
-                self.death_frame += 1
-            elif self.is_attacking:
-                self.attack_frame += 1
-            else:
-                self.move_frame += 1
-
-            self.time_elapsed -= self.loop_interval
-
-        # loop the move frame if at end of animation
-        if self.move_frame > len(self.move_frames) - 1:
-            self.move_frame = 0
-
-        # loop the move frame if at end of animation
-        if self.attack_frame > len(self.attack_frames) - 1:
-            self.attack_frame = 0
-
-            # attack only once if the enemy is ranged and it isn't right next to the player
-            if isinstance(self, Ranged) and not self.rect.x + self.rect.w <= self.display.player.rect.x + self.display.player.rect.x:
-                self.is_attacking = False
-
-        # loop the move frame if at end of animation
-        if self.death_frame > len(self.death_frames) - 1:
-            self.death_frame = len(self.death_frames) - 1
+        """ Advances the animation of whatever the enemy is doing. Returns whether its attack hit this step. """
+        if self.is_dying:
+            self.death_time += self.display.time
+            return False
+
+        if not self.is_attacking:
+            self.move_time += self.display.time
+            return False
+
+        before = self.attack_time
+        self.attack_time += self.display.time
+
+        # attack only once if the enemy is ranged and it isn't right next to the player
+        if self.attack_clip.passed(before, self.attack_time, 0) and isinstance(self, Ranged) and \
+           not self.rect.x + self.rect.w <= self.display.player.rect.x + self.display.player.rect.x:
+            self.is_attacking = False
+
+        return self.attack_clip.passed(before, self.attack_time, self.attack_at) > 0
 
     def update(self):
         """ Updates the player. """
@@ -207,58 +231,63 @@ class Skeleton(Enemy):
         self.move()
 
         # advance the amimation
-        self.loop_animation()
+        hit = self.loop_animation()
 
         # DYING
         if self.is_dying:
-            self.image = self.death_frames[self.death_frame]
+            clip = self.death_clip
+            frame = clip.frame_at(self.death_time)
             if self.rect.x + self.rect.w >= constants.SCREEN_WIDTH or \
                self.rect.y - self.rect.h <= 0:
                 self.display.dead_enemies.remove(self)
+                self.display.release(self)
         # ATTACKING
         elif self.is_attacking:
-            self.image = self.attack_frames[self.attack_frame]
+            clip = self.attack_clip
+            frame = clip.frame_at(self.attack_time)
             self.change_x = 0
             self.change_y = 0
-            if self.attack_frame == self.attack_at:
-                self.attack_frame += 1
-
+            if hit:
                 # release word 'arrow'
                 if isinstance(self, Ranged):
-                    self.display.projectiles.add(Projectile(self))
+                    self.display.shoot(self)
                 else:
                     self.display.player.update_health(-1)
         # MOVING
         else:
-            self.image = self.move_frames[self.move_frame]
+            clip = self.move_clip
+            frame = clip.frame_at(self.move_time)
             self.change_x = self.speed_x
             self.change_y = self.speed_y
 
-        # set new position given difference in rect dimensions
-        old_rect = self.rect
-        self.rect = self.image.get_rect()
-        self.rect.x = old_rect.x
-        self.rect.y = old_rect.y
-        self.rect.x += old_rect.w - self.rect.w
-        self.rect.y += old_rect.h - self.rect.h
+        # frames differ in size, so keep the bottom right corner of the enemy where it was
+        self.image = clip.frames[frame]
+        clip.place(self.rect, frame)
 
 
 class Melee(Skeleton):
+    # rect is touching the player
+    attack_range = 0
+
     def update(self):
         super().update()
         # always attack if close enough to player that rect is touching (range of enemy for melee)
-        if self.rect.x <= self.display.player.rect.x + self.display.player.rect.w +   0:  # 0 -> attack range
+        if self.rect.x <= self.display.player.rect.x + self.display.player.rect.w + self.attack_range:
             self.is_attacking = True
 
 
 class Ranged(Skeleton):
+    attack_range = 256
+
+    # every frame there is a 1 in attack_chance chance of attacking
+    attack_chance = 256
+
     def update(self):
         super().update()
         # always attack if in range of enemy
-        if self.rect.x <= self.display.player.rect.x + self.display.player.rect.w + 256:  # 256 -> attack range
+        if self.rect.x <= self.display.player.rect.x + self.display.player.rect.w + self.attack_range:
             self.is_attacking = True
 
-        # every frame there is a 1 in 256 chance of attacking
-        if random.randint(1, 256) == 256 and \
+        if random.randint(1, self.attack_chance) == self.attack_chance and \
            self.rect.x + self.rect.w <= constants.SCREEN_WIDTH:
             self.is_attacking = True
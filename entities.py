@@ -0,0 +1,344 @@
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import constants
+import animation
+import enemy
+
+
+# kinds of entity
+SKELETON = 0
+PROJECTILE = 1
+
+# columns of the engine, one entry per slot
+INT_COLUMNS = (
+    'kind', 'order',
+
+    # rect of the sprite and of the word over it
+    'x', 'y', 'w', 'h', 'word_x', 'word_y',
+
+    # movement
+    'change_x', 'change_y', 'speed_x', 'speed_y',
+
+    # where each animation starts in the frame table, and the frame currently shown
+    'move_start', 'attack_start', 'death_start',
+    'frame',
+
+    # how far in front of the player attacking starts
+    'attack_range'
+)
+BOOL_COLUMNS = ('active', 'ranged', 'is_attacking', 'is_dying', 'has_word')
+
+# how long each animation has been played for, and when the frame of the attack animation that hits starts, in ms
+FLOAT_COLUMNS = ('move_time', 'attack_time', 'death_time', 'hit_time')
+
+
+class EntityEngine:
+    """
+    Keeps the position, velocity, animation clock and state of every enemy and projectile in NumPy arrays,
+    and steps all of them at once instead of calling update() on every sprite.
+    Sprites still do the drawing and typing: their image and rects are written back after every step.
+    """
+    def __init__(self, display, capacity=64):
+        if np is None:
+            raise RuntimeError('the entity engine needs numpy, install it with: pip install numpy')
+
+        self.display = display
+
+        self.capacity = 0
+        for name in INT_COLUMNS:
+            setattr(self, name, np.zeros(0, np.int64))
+        for name in BOOL_COLUMNS:
+            setattr(self, name, np.zeros(0, bool))
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(0, np.float64))
+
+        # slot -> sprite kept in it, and the slots that are free, lowest last so that it is used first
+        self.sprites = []
+        self.free = []
+        self.grow(capacity)
+
+        # how many sprites have been added so far; events are handled in the order sprites were added
+        self.added = 0
+
+        # every frame of every animation, so that a frame is just an index; animations are added the first time they are seen
+        self.frames = []
+        self.frame_widths = np.zeros(0, np.int64)
+        self.frame_heights = np.zeros(0, np.int64)
+
+        # where an animation starts in the frame table -> the animation, and the other way round by id
+        self.clips = {}
+        self.clip_starts = {}
+
+        # a projectile is a single frame that never changes
+        self.projectile_clip = animation.Clip([enemy.Projectile.image])
+        self.projectile_clip.prepare()
+
+        # rolls for ranged skeletons attacking at random; seeded from random so that seeded games play out the same
+        self.rng = np.random.default_rng(random.getrandbits(64))
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def grow(self, capacity):
+        """ Makes room for at least 'capacity' sprites. """
+        if capacity <= self.capacity:
+            return
+
+        extra = capacity - self.capacity
+        for name in INT_COLUMNS + BOOL_COLUMNS + FLOAT_COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate((column, np.zeros(extra, column.dtype))))
+
+        self.sprites.extend([None] * extra)
+        self.free = list(range(capacity - 1, self.capacity - 1, -1)) + self.free
+        self.capacity = capacity
+
+    def clip(self, clip):
+        """ Returns where the frames of an animation start in the frame table, adding them the first time. """
+        start = self.clip_starts.get(id(clip))
+        if start is None:
+            start = self.clip_starts[id(clip)] = len(self.frames)
+            self.clips[start] = clip
+            self.frames.extend(clip.frames)
+            self.frame_widths = np.concatenate((self.frame_widths, [width for width, height in clip.sizes]))
+            self.frame_heights = np.concatenate((self.frame_heights, [height for width, height in clip.sizes]))
+
+        return start
+
+    def add(self, sprite):
+        """ Takes over stepping a skeleton or projectile that was just spawned. """
+        if not self.free:
+            self.grow(self.capacity * 2)
+
+        slot = self.free.pop()
+        sprite.slot = slot
+        self.sprites[slot] = sprite
+
+        self.active[slot] = True
+        self.order[slot] = self.added
+        self.added += 1
+
+        if isinstance(sprite, enemy.Projectile):
+            self.kind[slot] = PROJECTILE
+            self.move_start[slot] = self.attack_start[slot] = self.death_start[slot] = self.clip(self.projectile_clip)
+            self.move_time[slot] = self.attack_time[slot] = self.death_time[slot] = 0
+            self.speed_x[slot] = self.speed_y[slot] = 0
+            self.hit_time[slot] = 0
+            self.attack_range[slot] = 0
+            self.ranged[slot] = False
+        else:
+            self.kind[slot] = SKELETON
+            self.move_start[slot] = self.clip(sprite.move_clip)
+            self.attack_start[slot] = self.clip(sprite.attack_clip)
+            self.death_start[slot] = self.clip(sprite.death_clip)
+            self.move_time[slot] = sprite.move_time
+            self.attack_time[slot] = sprite.attack_time
+            self.death_time[slot] = sprite.death_time
+            self.speed_x[slot] = sprite.speed_x
+            self.speed_y[slot] = sprite.speed_y
+            self.hit_time[slot] = sprite.attack_clip.start_of(sprite.attack_at)
+            self.attack_range[slot] = sprite.attack_range
+            self.ranged[slot] = isinstance(sprite, enemy.Ranged)
+
+        self.frame[slot] = self.move_start[slot]
+        self.w[slot], self.h[slot] = sprite.rect.size
+        self.sync(sprite)
+
+    def sync(self, sprite):
+        """ Reads back what was changed on a sprite outside of a step: its rects, velocity and state. """
+        slot = sprite.slot
+        if slot is None:
+            return
+
+        self.x[slot], self.y[slot] = sprite.rect.topleft
+        self.change_x[slot] = sprite.change_x
+        self.change_y[slot] = sprite.change_y
+        self.is_attacking[slot] = getattr(sprite, 'is_attacking', False)
+        self.is_dying[slot] = getattr(sprite, 'is_dying', False)
+
+        self.has_word[slot] = bool(sprite.word_sprite_form)
+        if self.has_word[slot]:
+            self.word_x[slot], self.word_y[slot] = sprite.word_sprite.rect.topleft
+
+    def remove(self, sprite):
+        """ Hands a sprite its state back and stops stepping it. """
+        slot = sprite.slot
+        if slot is None:
+            return
+
+        sprite.change_x = int(self.change_x[slot])
+        sprite.change_y = int(self.change_y[slot])
+        if self.kind[slot] == SKELETON:
+            sprite.move_time = float(self.move_time[slot])
+            sprite.attack_time = float(self.attack_time[slot])
+            sprite.death_time = float(self.death_time[slot])
+
+        self.active[slot] = False
+        self.sprites[slot] = None
+        self.free.append(slot)
+        sprite.slot = None
+
+    def clear(self):
+        """ Stops stepping every sprite. """
+        for sprite in self.sprites:
+            if sprite is not None:
+                self.remove(sprite)
+
+    def in_order(self, slots):
+        """ Sprites in the slots, in the order they were added. """
+        slots = slots[np.argsort(self.order[slots], kind='stable')]
+        return [self.sprites[slot] for slot in slots.tolist()]
+
+    def by_clip(self, slots, start):
+        """ Splits slots by the animation that starts at 'start' for each of them. Yields the animation, where it starts and which slots play it. """
+        starts = start[slots]
+        for clip_start in np.unique(starts).tolist():
+            yield self.clips[clip_start], clip_start, starts == clip_start
+
+    def frames_at(self, slots, time, start):
+        """ Frame shown by each slot after playing its animation for 'time' ms, as an index into the frame table. """
+        frames = np.empty(len(slots), np.int64)
+        for clip, clip_start, playing in self.by_clip(slots, start):
+            elapsed = time[slots[playing]]
+            if clip.loop:
+                elapsed = np.mod(elapsed, clip.length)
+            frames[playing] = clip_start + np.minimum(np.searchsorted(clip.ends, elapsed, side='right'), len(clip) - 1)
+
+        return frames
+
+    def step(self):
+        """ Steps every skeleton, then every projectile, the way their update() would. """
+        display = self.display
+        player_rect = display.player.rect
+
+        skeletons = self.active & (self.kind == SKELETON)
+        was_attacking = self.is_attacking.copy()
+
+        # move, along with the word over it
+        self.x[skeletons] += self.change_x[skeletons]
+        self.y[skeletons] += self.change_y[skeletons]
+        self.word_x[skeletons] += self.change_x[skeletons]
+        self.word_y[skeletons] += self.change_y[skeletons]
+
+        # advance the animation of whatever each skeleton is doing
+        dying = skeletons & self.is_dying
+        attacking = skeletons & ~self.is_dying & self.is_attacking
+        walking = skeletons & ~self.is_dying & ~self.is_attacking
+        self.death_time[dying] += display.time
+        self.move_time[walking] += display.time
+
+        attacking = np.flatnonzero(attacking)
+        before = self.attack_time[attacking]
+        self.attack_time[attacking] += display.time
+        after = self.attack_time[attacking]
+
+        # attack animations loop, so a frame has started once for every time its start was passed
+        looped = np.zeros(len(attacking), bool)
+        hit = np.zeros(len(attacking), bool)
+        hit_time = self.hit_time[attacking]
+        for clip, clip_start, playing in self.by_clip(attacking, self.attack_start):
+            looped[playing] = np.floor(after[playing] / clip.length) > np.floor(before[playing] / clip.length)
+            hit[playing] = np.floor((after[playing] - hit_time[playing]) / clip.length) > \
+                np.floor((before[playing] - hit_time[playing]) / clip.length)
+
+        # attack only once if the enemy is ranged and it isn't right next to the player
+        stopped = attacking[looped & self.ranged[attacking] &
+                            ~(self.x[attacking] + self.w[attacking] <= player_rect.x + player_rect.x)]
+        self.is_attacking[stopped] = False
+
+        dying = np.flatnonzero(skeletons & self.is_dying)
+        hitting = attacking[hit & self.is_attacking[attacking]]
+        attacking = np.flatnonzero(skeletons & ~self.is_dying & self.is_attacking)
+        walking = np.flatnonzero(skeletons & ~self.is_dying & ~self.is_attacking)
+
+        self.frame[dying] = self.frames_at(dying, self.death_time, self.death_start)
+        self.frame[attacking] = self.frames_at(attacking, self.attack_time, self.attack_start)
+        self.frame[walking] = self.frames_at(walking, self.move_time, self.move_start)
+
+        # dead skeletons are done once they fly off the screen
+        culled = dying[(self.x[dying] + self.w[dying] >= constants.SCREEN_WIDTH) | (self.y[dying] - self.h[dying] <= 0)]
+
+        self.change_x[attacking] = 0
+        self.change_y[attacking] = 0
+        self.change_x[walking] = self.speed_x[walking]
+        self.change_y[walking] = self.speed_y[walking]
+
+        # projectiles start from where the skeleton was before it changed frame
+        shot_from = {slot: (x, y) for slot, x, y in zip(hitting.tolist(), self.x[hitting].tolist(), self.y[hitting].tolist())}
+
+        # set new position given difference in frame dimensions, keeping the bottom right corner in place
+        widths = self.frame_widths[self.frame[skeletons]]
+        heights = self.frame_heights[self.frame[skeletons]]
+        self.x[skeletons] += self.w[skeletons] - widths
+        self.y[skeletons] += self.h[skeletons] - heights
+        self.w[skeletons] = widths
+        self.h[skeletons] = heights
+
+        # always attack if close enough to the player
+        self.is_attacking |= skeletons & (self.x <= player_rect.x + player_rect.w + self.attack_range)
+
+        # ranged skeletons may also attack at random while on the screen
+        rolls = self.rng.integers(1, enemy.Ranged.attack_chance, self.capacity, endpoint=True)
+        self.is_attacking |= skeletons & self.ranged & (rolls == enemy.Ranged.attack_chance) & \
+            (self.x + self.w <= constants.SCREEN_WIDTH)
+
+        for slot in np.flatnonzero(self.is_attacking != was_attacking).tolist():
+            self.sprites[slot].is_attacking = bool(self.is_attacking[slot])
+
+        for sprite in self.in_order(hitting):
+            if self.ranged[sprite.slot]:
+                sprite.rect.topleft = shot_from[sprite.slot]
+                display.shoot(sprite)
+            else:
+                display.player.update_health(-1)
+
+        # projectiles, including any that were just shot
+        projectiles = self.active & (self.kind == PROJECTILE)
+        self.x[projectiles] += self.change_x[projectiles]
+        self.y[projectiles] += self.change_y[projectiles]
+        self.word_x[projectiles] += self.change_x[projectiles]
+        self.word_y[projectiles] += self.change_y[projectiles]
+
+        # if the projectile has 'collided' (not through rect/mask) with the player
+        hit = projectiles & (self.x + self.w <= player_rect.x + player_rect.w)
+        for _ in range(np.count_nonzero(hit)):
+            display.player.update_health(-1)
+
+        # if the player cannot see the projectile anymore
+        gone = hit | (projectiles & ((self.x + self.w >= constants.SCREEN_WIDTH) | (self.y - self.h <= 0)))
+        for sprite in self.in_order(np.flatnonzero(gone)):
+            display.projectiles.remove(sprite)
+            self.remove(sprite)
+            display.release(sprite)
+
+        for sprite in self.in_order(culled):
+            display.dead_enemies.remove(sprite)
+            self.remove(sprite)
+            display.release(sprite)
+
+    def attacking(self):
+        """ Whether any live skeleton is attacking. """
+        return bool((self.active & (self.kind == SKELETON) & ~self.is_dying & self.is_attacking).any())
+
+    def scroll(self, distance):
+        """ Moves every live skeleton and its word to the left, along with the background. """
+        live = self.active & (self.kind == SKELETON) & ~self.is_dying
+        self.x[live] -= int(distance)
+        self.word_x[live] -= int(distance)
+
+    def apply(self):
+        """ Writes the frame and rects of every sprite back to it, for drawing. """
+        slots = np.flatnonzero(self.active)
+        columns = (self.frame, self.x, self.y, self.w, self.h, self.has_word, self.word_x, self.word_y)
+        for slot, frame, x, y, w, h, has_word, word_x, word_y in zip(slots.tolist(), *(column[slots].tolist() for column in columns)):
+            sprite = self.sprites[slot]
+            sprite.image = self.frames[frame]
+            sprite.rect.topleft = (x, y)
+            sprite.rect.size = (w, h)
+            if has_word:
+                sprite.word_sprite.rect.topleft = (word_x, word_y)
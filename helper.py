@@ -1,8 +1,10 @@
-import os
+from collections import OrderedDict
 
 import pygame
 
 import constants
+import resources
+import animation
 
 
 knight_idle_frames = []
@@ -18,10 +20,75 @@ ranged_skeleton_walk_frames = []
 ranged_skeleton_attack_frames = []
 ranged_skeleton_death_frames = []
 
+# animations played from the frames above; prepared once the frames are loaded
+knight_idle = animation.Clip(knight_idle_frames)
+knight_walk = animation.Clip(knight_walk_frames)
+knight_attack = animation.Clip(knight_attack_frames, loop=False)
+knight_death = animation.Clip(knight_death_frames, loop=False)
+
+melee_skeleton_walk = animation.Clip(melee_skeleton_walk_frames)
+melee_skeleton_attack = animation.Clip(melee_skeleton_attack_frames)
+melee_skeleton_death = animation.Clip(melee_skeleton_death_frames, loop=False)
+
+ranged_skeleton_walk = animation.Clip(ranged_skeleton_walk_frames)
+ranged_skeleton_attack = animation.Clip(ranged_skeleton_attack_frames)
+ranged_skeleton_death = animation.Clip(ranged_skeleton_death_frames, loop=False)
+
+
+# one loaded font per (path, size)
+fonts = {}
+
+# recently rendered text, least recently used first; keyed by (text, path, size, color)
+rendered_text = OrderedDict()
+
+# how often the font and rendered text caches are hit or missed
+text_cache_stats = {
+    'font_hits': 0,
+    'font_misses': 0,
+    'text_hits': 0,
+    'text_misses': 0
+}
+
+
+def load_font(font, font_size):
+    """ Returns the font for the given path and size, only loading it the first time. """
+    key = (font, font_size)
+    text_font = fonts.get(key)
+
+    if text_font is None:
+        text_cache_stats['font_misses'] += 1
+        text_font = pygame.font.Font(font, font_size)
+        fonts[key] = text_font
+    else:
+        text_cache_stats['font_hits'] += 1
+
+    return text_font
+
+
+def render_text(text, font, font_size, color):
+    """ Returns the rendered surface of the text, reusing it if it was rendered recently. """
+    # colors are unhashable, so key on their components instead
+    key = (text, font, font_size, tuple(color))
+    text_surface = rendered_text.get(key)
+
+    if text_surface is None:
+        text_cache_stats['text_misses'] += 1
+        text_surface = load_font(font, font_size).render(text, True, color)
+        rendered_text[key] = text_surface
+
+        # forget the least recently used text once the cache is full
+        if len(rendered_text) > constants.TEXT_CACHE_SIZE:
+            rendered_text.popitem(last=False)
+    else:
+        text_cache_stats['text_hits'] += 1
+        rendered_text.move_to_end(key)
+
+    return text_surface
+
 
 def get_font(text, font, font_size, color, x, y, orientation):
-    text_font = pygame.font.Font(font, font_size)
-    text_surface = text_font.render(text, True, color)
+    # the surface is shared with the cache, so it must not be drawn on
+    text_surface = render_text(text, font, font_size, color)
     text_rect = text_surface.get_rect()
 
     if orientation == 'center':
@@ -36,39 +103,38 @@ def get_font(text, font, font_size, color, x, y, orientation):
 
 def get_sprite_frames():
     sprites = (
-        {'path': constants.KNIGHT_IDLE_PATH,            'frames': knight_idle_frames},
-        {'path': constants.KNIGHT_WALK_PATH,            'frames': knight_walk_frames},
-        {'path': constants.KNIGHT_ATTACK_PATH,          'frames': knight_attack_frames},
-        {'path': constants.KNIGHT_DEATH_PATH,           'frames': knight_death_frames},
-        {'path': constants.MELEE_SKELETON_WALK_PATH,    'frames': melee_skeleton_walk_frames},
-        {'path': constants.MELEE_SKELETON_ATTACK_PATH,  'frames': melee_skeleton_attack_frames},
-        {'path': constants.MELEE_SKELETON_DEATH_PATH,   'frames': melee_skeleton_death_frames},
-        {'path': constants.RANGED_SKELETON_WALK_PATH,   'frames': ranged_skeleton_walk_frames},
-        {'path': constants.RANGED_SKELETON_ATTACK_PATH, 'frames': ranged_skeleton_attack_frames},
-        {'path': constants.RANGED_SKELETON_DEATH_PATH,  'frames': ranged_skeleton_death_frames}
+        {'path': constants.KNIGHT_IDLE_PATH,            'clip': knight_idle},
+        {'path': constants.KNIGHT_WALK_PATH,            'clip': knight_walk},
+        {'path': constants.KNIGHT_ATTACK_PATH,          'clip': knight_attack},
+        {'path': constants.KNIGHT_DEATH_PATH,           'clip': knight_death},
+        {'path': constants.MELEE_SKELETON_WALK_PATH,    'clip': melee_skeleton_walk},
+        {'path': constants.MELEE_SKELETON_ATTACK_PATH,  'clip': melee_skeleton_attack},
+        {'path': constants.MELEE_SKELETON_DEATH_PATH,   'clip': melee_skeleton_death},
+        {'path': constants.RANGED_SKELETON_WALK_PATH,   'clip': ranged_skeleton_walk},
+        {'path': constants.RANGED_SKELETON_ATTACK_PATH, 'clip': ranged_skeleton_attack},
+        {'path': constants.RANGED_SKELETON_DEATH_PATH,  'clip': ranged_skeleton_death}
     )
 
-    for sprite in sprites:
-        for image in sorted(os.listdir(sprite['path'])):
-            frame = pygame.image.load(sprite['path'] + image).convert()
-            frame.set_colorkey(pygame.color.Color('White'))
-            sprite['frames'].append(frame)
+    # decode every frame at once on worker threads, then convert them in order
+    handles = [(sprite['clip'].frames, resources.load_image_async(sprite['path'] + image, 'colorkey'))
+               for sprite in sprites
+               for image in resources.list_images(sprite['path'])]
 
+    for frames, handle in handles:
+        frames.append(handle.result())
 
-class Image(pygame.sprite.Sprite):
-    def __init__(self, image):
-        super().__init__()
-        # image of sprite
-        self.image = pygame.image.load(constants.IMAGES_PATH + image).convert_alpha()
-
-        # rect of sprite
-        self.rect = self.image.get_rect()
+    for sprite in sprites:
+        sprite['clip'].prepare()
 
 
 class Text(pygame.sprite.Sprite):
     """ Static text. E.g. Words that do not move. """
     def __init__(self, word, font, color, font_size, x, y, *, orientation):
         super().__init__()
+        self.spawn(word, font, color, font_size, x, y, orientation=orientation)
+
+    def spawn(self, word, font, color, font_size, x, y, *, orientation):
+        """ Sets up the text, so that a pooled sprite can show new text. """
         # to change the size of the text later on
         self.word = word
         self.font = font
@@ -95,12 +161,93 @@ class Text(pygame.sprite.Sprite):
             self.image, self.rect = self.get_text()
 
 
+class InputLine(pygame.sprite.Sprite):
+    """ Text typed by the player. Only the glyph that was added or removed is rendered. """
+    def __init__(self, font, color, font_size, x, y):
+        super().__init__()
+        self.font = font
+        self.color = color
+        self.size = font_size
+
+        # the line is always centered on this position
+        self.x = x
+        self.y = y
+
+        self.text = ''
+
+        # where each glyph starts on the canvas
+        self.glyph_x = []
+        self.width = 0
+
+        # glyphs are drawn onto this once and it only grows if the line gets too long
+        self.height = load_font(self.font, self.size).get_height()
+        self.canvas = pygame.Surface((constants.SCREEN_WIDTH, self.height), pygame.SRCALPHA)
+
+        self.refresh()
+
+    def draw_glyph(self, index):
+        """ Draws a single glyph onto the canvas. """
+        glyph = render_text(self.text[index], self.font, self.size, self.color)
+        x = self.glyph_x[index]
+
+        # make room for the glyph if the line no longer fits
+        if x + glyph.get_width() > self.canvas.get_width():
+            canvas = pygame.Surface((self.canvas.get_width() * 2, self.height), pygame.SRCALPHA)
+            canvas.blit(self.canvas, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.canvas = canvas
+
+        # max blending copies the glyph onto the transparent canvas without darkening its edges
+        self.canvas.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        self.width = max(self.width, x + glyph.get_width())
+
+    def append(self, key):
+        """ Adds a letter to the end of the line. """
+        text_font = load_font(self.font, self.size)
+
+        # use the width of the text so far so that spacing matches rendering the whole line at once
+        self.glyph_x.append(text_font.size(self.text)[0])
+        self.text += key
+        self.draw_glyph(len(self.text) - 1)
+        self.refresh()
+
+    def pop(self):
+        """ Removes the last letter of the line. """
+        if not self.text:
+            return
+
+        x = self.glyph_x.pop()
+        self.text = self.text[:-1]
+        self.canvas.fill((0, 0, 0, 0), (x, 0, self.width - x, self.height))
+        self.width = x
+
+        # the previous glyph may have hung over the area that was cleared
+        if self.text:
+            self.draw_glyph(len(self.text) - 1)
+
+        self.refresh()
+
+    def clear(self):
+        """ Removes everything on the line. """
+        self.canvas.fill((0, 0, 0, 0), (0, 0, self.width, self.height))
+        self.text = ''
+        self.glyph_x = []
+        self.width = 0
+        self.refresh()
+
+    def refresh(self):
+        """ Points the image at the used part of the canvas and recenters it. """
+        self.image = self.canvas.subsurface((0, 0, self.width, self.height))
+        self.rect = self.image.get_rect()
+        self.rect.center = (self.x, self.y)
+
+
 class Score(Text):
     """ Active text. E.g. Words that move themselves. """
     display = None
 
-    def __init__(self, score, font, font_size, color, x, y, *, orientation):
-        super().__init__('+' + score, font, font_size, color, x, y, orientation=orientation)
+    def spawn(self, score, font, color, font_size, x, y, *, orientation):
+        """ Sets up the score for the enemy that just died, so that a pooled score can pop up again. """
+        super().spawn('+' + score, font, color, font_size, x, y, orientation=orientation)
         # the score to be added incrementally
         self.score = int(score)
 
@@ -108,12 +255,13 @@ class Score(Text):
         self.target_score = self.display.score_text + self.score
 
         # the time when the enemy dies
-        self.lifetime_call_time = pygame.time.get_ticks()
+        self.lifetime_call_time = self.display.ticks
 
     def check_lifetime(self):
         """ How long the text should remain around the enemy before disappearing. """
-        if pygame.time.get_ticks() - self.lifetime_call_time >= 1000 and self.display.score_text + self.score >= self.target_score:
+        if self.display.ticks - self.lifetime_call_time >= 1000 and self.display.score_text + self.score >= self.target_score:
             self.display.score_indicators.remove(self)
+            self.display.release(self)
 
     def update(self):
         self.check_lifetime()
@@ -126,23 +274,33 @@ class Score(Text):
         else:
             self.display.score_text += 4
 
-        self.display.score_text_sprite.sprite.word = 'score: ' + str(self.display.score_text)
-        self.display.score_text_sprite.sprite.image, self.display.score_text_sprite.sprite.rect = self.display.score_text_sprite.sprite.get_text()
 
+class WordGroup(pygame.sprite.Group):
+    """ Group that keeps the words of its sprites in a word index. """
+    def __init__(self, index, *sprites):
+        self.index = index
+        super().__init__(*sprites)
 
-class BackgroundSprite(pygame.sprite.Sprite):
-    """ Each layer of the background. """
-    replaced = False
+    def add_internal(self, sprite, *args):
+        super().add_internal(sprite, *args)
+        self.index.add(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.index.discard(sprite)
 
+
+class BackgroundSprite(pygame.sprite.Sprite):
+    """ Each layer of the background. The layer repeats itself, so it only ever has to be prepared once. """
     def __init__(self, path, image_name, layer, scroll_speed):
         super().__init__()
-        self.image = pygame.image.load(path + image_name).convert_alpha()
+        # copied, since the lighting below is drawn onto it
+        self.image = resources.load_image(path + image_name).copy()
         self.rect = self.image.get_rect()
 
         # ensures that background layers are drawn in order 
         self._layer = layer
 
-        # Used when we want to make a copy of the current layer
         self.path = path
         self.image_name = image_name
         self.scroll_speed = scroll_speed
@@ -153,20 +311,20 @@ class BackgroundSprite(pygame.sprite.Sprite):
         filter.set_alpha(96 // (int(self.image_name[0]) + 1))
         self.image.blit(filter, (0, 0))
 
-        # only layers with scroll speeds that are not integers need this
-        self.scroll_by = 0
+        # how far the layer has scrolled into its image; kept as a float so slow layers do not lose movement
+        self.offset = 0.0
 
     def scroll_layer(self):
-        """ Account for the fact that float values are truncated when updating rect position. """
-        # just update position if scroll_speed is already an integer
-        if self.scroll_speed.is_integer():
-            self.rect.x -= self.scroll_speed
-        else:
-            self.scroll_by += self.scroll_speed
-            # only update position when scroll_by is an integer
-            if self.scroll_by.is_integer():
-                self.rect.x -= self.scroll_by
-                self.scroll_by = 0
+        """ Scrolls the layer, wrapping around once a whole image has gone by. """
+        self.offset = (self.offset + self.scroll_speed) % self.rect.w
+        self.rect.x = -int(self.offset)
+
+    def draw(self, surface):
+        """ Draws the layer as many times as it takes to cover the screen. """
+        x = self.rect.x
+        while x < constants.SCREEN_WIDTH:
+            surface.blit(self.image, (x, self.rect.y))
+            x += self.rect.w
 
     @property
     def layer(self):
@@ -178,9 +336,6 @@ class Background(BackgroundSprite):
     display = None
 
     def __init__(self, path):
-        # all layers to call draw on
-        self.layers = pygame.sprite.LayeredUpdates()
-
         # scroll speed for each layer
         self.scroll_speeds = {
             '0.png': 0.00,
@@ -191,38 +346,57 @@ class Background(BackgroundSprite):
             '5.png': 3.00
         }
 
-        for layer_number, image_name in enumerate(sorted(os.listdir(path))):
-            layer = BackgroundSprite(path, image_name, layer_number, self.scroll_speeds[image_name])
-            self.layers.add(layer)
+        # enemies move along with the front layer
+        self.enemy_scroll_speed = max(self.scroll_speeds.values())
+
+        # start decoding every layer at once; the layers below wait for their own image
+        self.prefetch(path)
+
+        # all layers, back to front
+        self.layers = []
+        for layer_number, image_name in enumerate(resources.list_images(path)):
+            self.layers.append(BackgroundSprite(path, image_name, layer_number, self.scroll_speeds[image_name]))
+
+            # the layer darkened its own copy, so the cached image is not needed anymore
+            resources.evict(path + image_name)
+
+    @staticmethod
+    def prefetch(path):
+        """ Starts decoding every layer of a background on worker threads. """
+        return [resources.load_image_async(path + image_name) for image_name in resources.list_images(path)]
+
+    def draw(self, surface):
+        """ Draws every layer, back to front. """
+        for layer in self.layers:
+            layer.draw(surface)
 
     def parallax(self):
-        """ Adds a parallax effect to the background. """
-        if self.display.player.attack_frame:
-            return
+        """ Adds a parallax effect to the background. Returns whether the background moved. """
+        if self.display.player.attack_time:
+            return False
         
+        entities = self.display.entities
+
         # move the player if the player is not attacking or no enemies are attacking the player
-        for enemy in self.display.enemies:
-            if enemy.is_attacking:
-                return
-        
+        if entities is not None:
+            if entities.attacking():
+                return False
+        else:
+            for enemy in self.display.enemies:
+                if enemy.is_attacking:
+                    return False
+
         for layer in self.layers:
-            # extend the layer if it no longer fully covers the screen
-            if layer.rect.x + layer.rect.w <= constants.SCREEN_WIDTH and not layer.replaced:
-                layer.replaced = True
-                new_layer = BackgroundSprite(layer.path, layer.image_name, layer.layer, layer.scroll_speed)
-                new_layer.rect.x = layer.rect.x + layer.rect.w
-                self.layers.add(new_layer)
-            # move the layer if not extending it; scrolling makes placing a copy in the perfect position more difficult
-            elif layer.scroll_speed > 0:
+            if layer.scroll_speed > 0:
                 layer.scroll_layer()
 
-            # remove the layer if it is no longer visible 
-            if layer.rect.x + layer.rect.w <= 0:
-                self.layers.remove(layer)
-
         # moves enemies along with the background
-        for enemy in self.display.enemies:
-            scroll_speed = list(self.scroll_speeds.values())[-1]
-            enemy.rect.x -= scroll_speed
-            for word in enemy.word_sprite_form:
-                word.rect.x -= scroll_speed
+        if entities is not None:
+            entities.scroll(self.enemy_scroll_speed)
+        else:
+            for enemy in self.display.enemies:
+                enemy.rect.x -= self.enemy_scroll_speed
+                for word in enemy.word_sprite_form:
+                    word.rect.x -= self.enemy_scroll_speed
+
+        return True
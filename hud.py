@@ -0,0 +1,110 @@
+import pygame
+
+import constants
+import resources
+import helper
+
+
+class Hud:
+    """
+    Healthbar, score and score multiplier, composited onto one surface that is only redrawn when one of them changes.
+    Every health state and every glyph the text needs is rendered once up front, so redrawing is only blits.
+    """
+    # top left corner of the healthbar, and of the score and multiplier text, on the screen
+    healthbar_position = (640, 16)
+    score_position = (640, 72)
+    multiplier_position = (640, 108)
+
+    font = constants.FONTS_PATH + '8bitoperator.ttf'
+    font_size = 24
+    color = pygame.color.Color('White')
+
+    # every character the score and multiplier are made of
+    characters = 'score: x.-+0123456789'
+
+    def __init__(self, display):
+        self.display = display
+
+        # the whole healthbar for every amount of health from none to full
+        self.health_images = self.render_health_states(display.player.base_health)
+
+        # size -> character -> (glyph, how far it moves the next glyph); the score grows when an enemy is hit
+        self.glyphs = {}
+        for size in range(self.font_size, int(self.font_size * 1.5) + 1):
+            self.render_glyphs(size)
+
+        # values currently drawn; None until first drawn
+        self.shown = None
+
+        # size of the score text, which shrinks back to the normal size after growing
+        self.score_size = self.font_size
+
+        # the composited surface, big enough for the score at its largest pre-rendered size, and where it goes
+        line_height = helper.load_font(self.font, int(self.font_size * 1.5)).get_linesize()
+        self.rect = pygame.Rect(self.healthbar_position,
+                                (constants.SCREEN_WIDTH - self.healthbar_position[0],
+                                 max(self.score_position[1], self.multiplier_position[1]) + line_height - self.healthbar_position[1]))
+        self.image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+
+        # whether the surface was redrawn since it was last drawn to the screen
+        self.changed = True
+
+    def render_health_states(self, base_health):
+        """ Draws the healthbar for every amount of health, with the health cropped to it. """
+        healthbar = resources.load_image(constants.IMAGES_PATH + 'healthbar.png')
+        health = resources.load_image(constants.IMAGES_PATH + 'health.png')
+
+        # the health is centered on the bar as if it were full
+        health_rect = health.get_rect(center=healthbar.get_rect().center)
+
+        images = []
+        for amount in range(base_health + 1):
+            image = healthbar.copy()
+            width = round((health.get_width() / base_health) * amount)
+            if width:
+                image.blit(health, health_rect, (0, 0, width, health.get_height()))
+            images.append(image)
+
+        return images
+
+    def render_glyphs(self, size):
+        text_font = helper.load_font(self.font, size)
+        self.glyphs[size] = {character: (text_font.render(character, True, self.color), text_font.size(character)[0])
+                             for character in self.characters}
+        return self.glyphs[size]
+
+    def blit_text(self, text, size, position):
+        """ Puts text together from its glyphs onto the composited surface. """
+        glyphs = self.glyphs.get(size) or self.render_glyphs(size)
+        x = position[0] - self.rect.x
+        y = position[1] - self.rect.y
+        for character in text:
+            glyph, advance = glyphs[character]
+
+            # max blending copies the glyph onto the transparent surface without darkening its edges
+            self.image.blit(glyph, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+            x += advance
+
+    def bounce(self):
+        """ Makes the score bigger for a moment, never past the largest size its glyphs and the surface are made for. """
+        self.score_size = min(int(self.score_size * 1.5), int(self.font_size * 1.5))
+
+    def update(self):
+        """ Shrinks the score back to its size, and redraws the surface if anything shown changed. """
+        self.score_size = max(self.score_size - 1, self.font_size)
+
+        health = min(max(self.display.player.health, 0), self.display.player.base_health)
+        shown = (health, self.display.score_text, self.display.score_multiplier_text, self.score_size)
+        if shown == self.shown:
+            return
+
+        self.shown = shown
+        self.image.fill((0, 0, 0, 0))
+        self.image.blit(self.health_images[health], (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        self.blit_text(f'score: {self.display.score_text}', self.score_size, self.score_position)
+        self.blit_text(f'x{self.display.score_multiplier_text}', self.font_size, self.multiplier_position)
+        self.changed = True
+
+    def draw(self, surface):
+        surface.blit(self.image, self.rect)
+        self.changed = False
@@ -0,0 +1,153 @@
+import json
+import time
+from array import array
+from collections import deque
+
+import constants
+
+
+class KeyTracer:
+    """
+    Times every key from when it is read from the event queue until the frame showing it is on the screen:
+    when it is read, when press_key handles it, when the frame is drawn and when the frame is flipped.
+    Costs next to nothing while disabled.
+    """
+    # the steps of a key in order, each timed from the one before
+    phases = ('handle', 'draw', 'flip')
+
+    def __init__(self, budget=constants.KEY_LATENCY_BUDGET):
+        self.enabled = False
+
+        # longest a key may take to show up, in ms; frames with a slower key are flagged
+        self.budget = budget
+
+        # keys read but not on the screen yet, as [read, handled, drawn] times
+        self.pending = []
+
+        # frames flipped so far
+        self.frame = 0
+
+        # how many keys took each bucket of time from being read to being shown; the last bucket holds the rest
+        self.histogram = array('I', bytes(4 * (constants.KEY_LATENCY_BUCKETS + 1)))
+
+        # total time spent in each phase, and the number of keys and slowest key so far, in ms
+        self.totals = dict.fromkeys(self.phases, 0.0)
+        self.keys = 0
+        self.slowest = 0.0
+
+        # the last frames that showed a key too late, as (frame, slowest key in ms)
+        self.flagged = deque(maxlen=constants.KEY_LATENCY_FLAGGED)
+        self.flagged_count = 0
+
+    def read(self):
+        """ A key was just read from the event queue. """
+        if self.enabled:
+            self.pending.append([time.perf_counter(), None, None])
+
+    def handled(self):
+        """ press_key finished handling the last key read. """
+        if self.enabled and self.pending:
+            self.pending[-1][1] = time.perf_counter()
+
+    def dropped(self):
+        """ press_key ignored the last key read, so it never shows up and is not counted. """
+        if self.enabled and self.pending:
+            self.pending.pop()
+
+    def drawn(self):
+        """ The frame showing every key read so far has been drawn. """
+        if not (self.enabled and self.pending):
+            return
+
+        now = time.perf_counter()
+        for stamps in self.pending:
+            if stamps[2] is None:
+                stamps[2] = now
+
+    def flipped(self):
+        """ The frame is on the screen; every key it shows is done. """
+        if not self.enabled:
+            return
+
+        self.frame += 1
+        if not self.pending:
+            return
+
+        now = time.perf_counter()
+        slowest = 0.0
+        still_pending = []
+        for read, handled, drawn in self.pending:
+            # read after the frame was drawn, so it shows up in the next one
+            if drawn is None:
+                still_pending.append([read, handled, drawn])
+                continue
+
+            self.totals['handle'] += (handled - read) * 1000
+            self.totals['draw'] += (drawn - handled) * 1000
+            self.totals['flip'] += (now - drawn) * 1000
+
+            total = (now - read) * 1000
+            self.histogram[min(int(total // constants.KEY_LATENCY_BUCKET), constants.KEY_LATENCY_BUCKETS)] += 1
+            self.keys += 1
+            slowest = max(slowest, total)
+        self.pending = still_pending
+
+        self.slowest = max(self.slowest, slowest)
+        if slowest > self.budget:
+            self.flagged.append((self.frame, slowest))
+            self.flagged_count += 1
+
+    def percentile(self, fraction):
+        """ Upper edge of the histogram bucket the given fraction of keys were shown within, in ms. """
+        if not self.keys:
+            return 0.0
+
+        rank = max(1, round(fraction * self.keys))
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return min((bucket + 1) * constants.KEY_LATENCY_BUCKET, self.slowest)
+        return self.slowest
+
+    def report(self):
+        """ Latency of the keys traced so far, in ms. """
+        return {
+            'keys': self.keys,
+            'frames': self.frame,
+            'budget': self.budget,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.slowest,
+            'mean': {phase: total / self.keys if self.keys else 0.0 for phase, total in self.totals.items()},
+            'bucket': constants.KEY_LATENCY_BUCKET,
+            'histogram': list(self.histogram),
+            'over_budget': self.flagged_count,
+            'flagged_frames': [{'frame': frame, 'latency': latency} for frame, latency in self.flagged]
+        }
+
+    def format(self, width=40):
+        """ The histogram and a summary as lines of text. """
+        report = self.report()
+        lines = [f"{report['keys']} keys: p50 {report['p50']:.1f} ms, p95 {report['p95']:.1f} ms, "
+                 f"p99 {report['p99']:.1f} ms, max {report['max']:.1f} ms",
+                 'mean ' + ', '.join(f'{phase} {mean:.2f} ms' for phase, mean in report['mean'].items())]
+
+        # buckets past the slowest key are left out
+        counts = report['histogram']
+        last = max((bucket for bucket, count in enumerate(counts) if count), default=-1)
+        most = max(counts) or 1
+        for bucket in range(last + 1):
+            low = bucket * report['bucket']
+            label = f'{low:>4}+ ms' if bucket == len(counts) - 1 else f'{low:>4}-{low + report["bucket"]:<4} ms'
+            over = '!' if low >= report['budget'] else ' '
+            lines.append(f"{label} {over}{'#' * round(counts[bucket] / most * width):<{width}} {counts[bucket]}")
+
+        lines.append(f"{report['over_budget']} frames showed a key later than {report['budget']} ms")
+        return lines
+
+    def dump(self, path):
+        """ Writes the report as JSON. """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
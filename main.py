@@ -1,17 +1,29 @@
+import os
+import sys
+import time
+import random
+import argparse
+
 import pygame
 
 import constants
+import audio
+import resources
+import recording
 from helper import get_sprite_frames
 import displays
 
 
-def main():
-    pygame.mixer.pre_init(44100, -16, 2, 2048)
-    pygame.mixer.init()
+def init(headless=False, audio_buffer=constants.AUDIO_BUFFER):
+    """ Starts pygame and returns the window and the offscreen surface drawn to. """
+    if headless:
+        # no window and no sound card; must be set before pygame starts
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    # the mixer has to start before pygame.init does it with the default buffer
+    audio.init(audio_buffer)
     pygame.init()
-    dungeon_ambience = pygame.mixer.Sound(constants.SOUNDS_PATH + 'dungeon_ambience.wav')
-    dungeon_ambience.set_volume(0.25)
-    dungeon_ambience.play(loops=-1, fade_ms=5000)
 
     # set screen
     view = pygame.display.set_mode((constants.SCREEN_WIDTH, constants.SCREEN_HEIGHT))
@@ -23,9 +35,31 @@ def main():
     # preload all images
     get_sprite_frames()
 
+    return view, screen
+
+
+def report_latency(tracer, path):
+    """ Prints the key latency histogram and saves the report as JSON. """
+    print('\n'.join(tracer.format()))
+    tracer.dump(path)
+
+
+def main(profile=None, record=None, audio_buffer=constants.AUDIO_BUFFER, trace_latency=None):
+    view, screen = init(audio_buffer=audio_buffer)
+    audio.play_ambience()
+
+    # everything random in the game follows this seed, so a session can be played again from its keys and frame times
+    seed = recording.new_seed()
+    random.seed(seed)
+    recorder = recording.Recorder(record, seed, displays.Display.entity_engine) if record is not None else None
+
     # creates the display that handles all game mechanics and drawing
     display = displays.Display(view, screen)
 
+    # profile every frame from the start if the timings are to be saved
+    display.profiler.enabled = profile is not None
+    display.latency.enabled = trace_latency is not None
+
     # initialize the clock
     clock = pygame.time.Clock()
 
@@ -33,36 +67,183 @@ def main():
     pygame.display.set_caption("Type It")
 
     # set the icon of the window
-    icon = pygame.image.load(constants.ICON_PATH).convert_alpha()
+    icon = resources.load_image(constants.ICON_PATH)
     pygame.display.set_icon(icon)
 
     while True:
+        display.profiler.start()
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if profile is not None:
+                    display.profiler.dump(profile)
+                if recorder is not None:
+                    recorder.close(display)
+                if trace_latency is not None:
+                    report_latency(display.latency, trace_latency)
                 pygame.quit()
                 quit()
 
             if event.type == pygame.KEYDOWN:
                 if event.unicode.isalpha() or event.unicode == ' ':
-                    display.press_key(event.unicode)
+                    key = event.unicode
                 elif event.key == pygame.K_BACKSPACE:
-                    display.press_key('backspace')
+                    key = 'backspace'
                 elif event.key == pygame.K_RETURN:
-                    display.press_key('return')
-
-        # store time since last call of clock.tick
-        display.time = clock.tick(constants.FPS)
-
-        # draws and updates the display
-        display.update()
+                    key = 'return'
+                else:
+                    key = None
+                    if event.key == pygame.K_F3:
+                        display.toggle_overlay()
+
+                if key is not None:
+                    display.latency.read()
+                    display.press_key(key)
+                    if recorder is not None:
+                        recorder.key(key)
+        display.profiler.mark('main.events')
+
+        audio.fade_ambience()
+
+        # simulate the time since last call of clock.tick in fixed steps, then draw the result once
+        frame_time = clock.tick(constants.FPS)
+        display.profiler.mark('main.tick')
+        if recorder is not None:
+            recorder.frame(frame_time)
+        display.advance(frame_time)
         display.draw()
 
         # blits the 'screen' surface to the screen the player actually sees
-        view.blit(screen, next(display.offset))
+        display.present()
+        display.profiler.end_frame()
 
-        # update the screen
-        pygame.display.flip()
+
+def headless(frames, frame_time=constants.STEP_TIME, profile=None):
+    """ Runs the game loop without a window, sound or frame cap, and reports how fast it ran. """
+    view, screen = init(headless=True)
+    display = displays.Display(view, screen)
+    display.profiler.enabled = profile is not None
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        display.profiler.start()
+
+        # pretend that exactly frame_time has passed since the last frame
+        display.advance(frame_time)
+        display.draw()
+        display.present()
+        display.profiler.end_frame()
+
+    wall_time = time.perf_counter() - start
+    if profile is not None:
+        display.profiler.dump(profile)
+    pygame.quit()
+
+    return {
+        'frames': frames,
+        'simulated_time': frames * frame_time / 1000,
+        'wall_time': wall_time,
+        'fps': frames / wall_time
+    }
+
+
+def replay(path, draw=True, profile=None, trace_latency=None):
+    """ Plays a recorded session again without a window, sound or frame cap, and checks that it ends the same. """
+    session = recording.Recording(path)
+    if session.step_time != constants.STEP_TIME:
+        raise ValueError(f'{path} was recorded stepping every {session.step_time} ms, not every {constants.STEP_TIME} ms')
+
+    view, screen = init(headless=True)
+    displays.Display.entity_engine = session.entity_engine
+    random.seed(session.seed)
+    display = displays.Display(view, screen)
+    display.profiler.enabled = profile is not None
+
+    # keys only reach the screen when frames are drawn
+    display.latency.enabled = trace_latency is not None and draw
+
+    start = time.perf_counter()
+    for frame_time, keys in session.frames:
+        display.profiler.start()
+
+        # keys are handled before the frame is simulated, as in the game loop
+        for key in keys:
+            display.latency.read()
+            display.press_key(key)
+        display.profiler.mark('main.events')
+
+        display.advance(frame_time)
+
+        # drawing changes nothing in the game, so it can be left out when only the outcome matters
+        if draw:
+            display.draw()
+            display.present()
+        display.profiler.end_frame()
+
+    wall_time = time.perf_counter() - start
+    if profile is not None:
+        display.profiler.dump(profile)
+    if display.latency.enabled:
+        report_latency(display.latency, trace_latency)
+    result = recording.outcome(display, len(session))
+    pygame.quit()
+
+    return {
+        'frames': len(session),
+        'simulated_time': display.ticks / 1000,
+        'wall_time': wall_time,
+        'fps': len(session) / wall_time if wall_time else 0,
+        'outcome': result,
+        'recorded': session.outcome,
+
+        # a session whose recording was cut off has nothing to be checked against
+        'matches': session.outcome is None or session.outcome == result
+    }
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Type It')
+    parser.add_argument('--headless', action='store_true', help='run without a window or sound, as fast as possible')
+    parser.add_argument('--frames', type=int, default=1000, help='frames to simulate when headless')
+    parser.add_argument('--frame-time', type=float, default=constants.STEP_TIME, help='simulated ms per frame when headless')
+    parser.add_argument('--dirty-rects', action='store_true', default=constants.DIRTY_RECTS,
+                        help='only push the parts of the screen that changed')
+    parser.add_argument('--entity-engine', action='store_true', default=constants.ENTITY_ENGINE,
+                        help='step enemies and projectiles in NumPy arrays instead of one sprite at a time')
+    parser.add_argument('--record', metavar='PATH', help='write the seed, frame times and keys of the session to PATH')
+    parser.add_argument('--replay', metavar='PATH', help='play a recorded session again headless, as fast as possible')
+    parser.add_argument('--no-draw', action='store_true', help='only simulate when replaying, without drawing')
+    parser.add_argument('--audio-buffer', type=int, default=constants.AUDIO_BUFFER,
+                        help='samples the mixer buffers; smaller plays sounds sooner but may crackle')
+    parser.add_argument('--audio-latency', action='store_true', help='measure how long sounds take to be heard and exit')
+    parser.add_argument('--trace-latency', metavar='PATH',
+                        help='time every key from being read until it is on the screen, print a histogram on exit and save it as JSON')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='time every phase of every frame and save the last ones on exit, as JSON if PATH ends in .json, otherwise CSV')
+    args = parser.parse_args()
+
+    displays.Display.dirty_rects = args.dirty_rects
+    displays.Display.entity_engine = args.entity_engine
+
+    if args.audio_latency:
+        init(headless=args.headless, audio_buffer=args.audio_buffer)
+        result = audio.latency()
+        pygame.quit()
+        if not result:
+            sys.exit('no sound')
+        print(f"{result['buffer']} samples at {result['frequency']} Hz: {result['buffer_latency']:.1f} ms buffered "
+              f"+ {result['measured_latency']:.1f} ms measured = {result['latency']:.1f} ms")
+    elif args.replay:
+        result = replay(args.replay, not args.no_draw, args.profile, args.trace_latency)
+        print(f"{result['frames']} frames ({result['simulated_time']:.1f} s simulated) "
+              f"in {result['wall_time']:.3f} s: {result['fps']:.1f} frames per second")
+        print('outcome', result['outcome'])
+        if not result['matches']:
+            print('recorded', result['recorded'])
+            sys.exit('replay did not end the same as the recorded session')
+    elif args.headless:
+        result = headless(args.frames, args.frame_time, args.profile)
+        print(f"{result['frames']} frames ({result['simulated_time']:.1f} s simulated) "
+              f"in {result['wall_time']:.3f} s: {result['fps']:.1f} frames per second")
+    else:
+        main(args.profile, args.record, args.audio_buffer, args.trace_latency)
@@ -7,23 +7,20 @@ class Player(pygame.sprite.Sprite):
     # the current display
     display = None
 
-    # time elapsed for constant animation speed
-    time_elapsed = 0
+    # all animations
+    idle_clip = helper.knight_idle
+    move_clip = helper.knight_walk
+    attack_clip = helper.knight_attack
+    death_clip = helper.knight_death
 
-    # how fast the sprite updates
-    loop_interval = 100  # 0.1 s
+    # how long each animation has been played for, in ms
+    idle_time = 0
+    move_time = 0
+    attack_time = 0
+    death_time = 0
 
-    # all frames
-    idle_frames = helper.knight_idle_frames
-    move_frames = helper.knight_walk_frames
-    attack_frames = helper.knight_attack_frames
-    death_frames = helper.knight_death_frames
-
-    # the current frames for each of animations
-    idle_frame = 0
-    move_frame = 0
-    attack_frame = 0
-    death_frame = 0
+    # frame of the attack animation that hits the target
+    strike_at = 6
 
     # player health
     base_health = 10
@@ -39,7 +36,7 @@ class Player(pygame.sprite.Sprite):
         super().__init__()
 
         # the starting frame -> this will change as the game runs
-        self.image = self.move_frames[self.move_frame]
+        self.image = self.move_clip.frames[0]
 
         # rect of the starting frame
         self.rect = self.image.get_rect()
@@ -48,108 +45,68 @@ class Player(pygame.sprite.Sprite):
         self.rect.x = 150
         self.rect.y = 300
 
-        # contains player healthbar
-        self.healthbar = self.update_healthbar()
+    def enemy_attacking(self):
+        """ Whether any live enemy is attacking the player. """
+        for enemy in self.display.enemies:
+            if enemy.is_attacking and \
+               enemy not in self.display.dead_enemies:
+                return True
+
+        return False
 
     def loop_animation(self):
-        """ Advances animation. """
-        self.time_elapsed += self.display.time
-        while self.time_elapsed >= self.loop_interval:
-            if self.health <= 0:
-                self.death_frame += 1
-            elif self.target:
-                self.attack_frame += 1
-            else:
-                for enemy in self.display.enemies:
-                    if enemy.is_attacking and \
-                       enemy not in self.display.dead_enemies:
-                        self.idle_frame += 1
-                        break
-                else:
-                    self.move_frame += 1
-
-            # take away one frame from amount of frames to advance, in the form of time
-            self.time_elapsed -= self.loop_interval
-
-        # loop the idle frame if at end of animation
-        if self.idle_frame > len(self.idle_frames) - 1:
-            self.idle_frame = 0
-
-        # loop the move frame if at end of animation
-        if self.move_frame > len(self.move_frames) - 1:
-            self.move_frame = 0
-
-        # end the death frame at its last frame if the end of the animation is reached
-        if self.death_frame > len(self.death_frames) - 1:
-            self.death_frame = self.death_frame - 1
-
-            # fade screen to black
-            self.display.death = True
-
-        # loop the attack frame if at end of animation
-        if self.attack_frame >= len(self.attack_frames) - 1:
-            self.attack_frame = 0
-            self.target = None
+        """ Advances the animation of whatever the player is doing. Returns whether the target is struck this step. """
+        if self.health <= 0:
+            self.death_time += self.display.time
+
+            # fade screen to black once the player has finished dying
+            if self.death_clip.finished(self.death_time):
+                self.display.death = True
+        elif self.target:
+            before = self.attack_time
+            self.attack_time += self.display.time
+
+            # the attack is over once it reaches its last frame
+            if self.attack_clip.frame_at(self.attack_time) >= len(self.attack_clip) - 1:
+                self.attack_time = 0
+                self.target = None
+                return False
+
+            return self.attack_clip.passed(before, self.attack_time, self.strike_at) > 0
+        elif self.enemy_attacking():
+            self.idle_time += self.display.time
+        else:
+            self.move_time += self.display.time
+
+        return False
 
     def update(self):
         """ Update the sprite. """
-        self.loop_animation()
+        strike = self.loop_animation()
 
         # DYING
         if self.health <= 0:
-            self.image = self.death_frames[self.death_frame]
+            clip, frame = self.death_clip, self.death_clip.frame_at(self.death_time)
         # ATTACKING
         elif self.target:
-            self.image = self.attack_frames[self.attack_frame]
-            if self.attack_frame == 6:
+            clip, frame = self.attack_clip, self.attack_clip.frame_at(self.attack_time)
+            if strike:
                 self.target.dead()
-                self.attack_frame += 1
-                self.display.score_text_sprite.sprite.size = int(self.display.score_text_sprite.sprite.size * 1.5)
+                self.display.hud.bounce()
 
                 # shake the screen
                 self.display.offset = self.display.shake()
+        # IDLING
+        elif self.enemy_attacking():
+            clip, frame = self.idle_clip, self.idle_clip.frame_at(self.idle_time)
+        # MOVING
         else:
-            # IDLING
-            for enemy in self.display.enemies:
-                if enemy.is_attacking and \
-                   enemy not in self.display.dead_enemies:
-                    self.image = self.idle_frames[self.idle_frame]
-                    break
-            # MOVING
-            else:
-                self.image = self.move_frames[self.move_frame]
-
-        # set new rect to adjust the new y position
-        old_rect = self.rect
-        self.rect = self.image.get_rect()
-        self.rect.x = old_rect.x
-        self.rect.y = old_rect.y
-        self.rect.x += old_rect.w - self.rect.w
-        self.rect.y += old_rect.h - self.rect.h
+            clip, frame = self.move_clip, self.move_clip.frame_at(self.move_time)
+
+        # frames differ in size, so keep the bottom right corner of the player where it was
+        self.image = clip.frames[frame]
+        clip.place(self.rect, frame)
 
     def update_health(self, health):
         """" Updates player hp. """
         self.health += health
-        self.healthbar = self.update_healthbar()
-
-    def update_healthbar(self):
-        """ Updates healthbar according to player health. """
-        healthbar_group = pygame.sprite.Group()
-
-        # creates a sprite object with custom surface, rect, and mask attributes
-        healthbar = helper.Image('healthbar.png')
-        healthbar.rect.x = 640
-        healthbar.rect.y = 16
-        healthbar_group.add(healthbar)
-
-        if self.health > 0:
-            health = helper.Image('health.png')
-            health_width = round((health.rect.w / self.base_health) * self.health)
-            health_height = health.image.get_height()
-            cropped = pygame.Surface((health_width, health_height), pygame.SRCALPHA)
-            cropped.blit(health.image, (0, 0))
-            health.image = cropped
-            health.rect.center = healthbar.rect.center
-            healthbar_group.add(health)
-
-        return healthbar_group
@@ -0,0 +1,78 @@
+class Pool:
+    """
+    Keeps objects that are no longer used so that they can be set up again instead of being built from scratch.
+    Objects are built with factory(*args) and set up again with obj.spawn(*args), which must leave them as good as new.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+
+        # released objects waiting to be used again
+        self.free = []
+
+        # objects handed out and not released yet, and the most there have been at once since the pool was last trimmed
+        self.in_use = 0
+        self.peak = 0
+
+        # the peak before the last trim; the pool holds enough objects for the larger of it and the current peak
+        self.capacity = 0
+
+        # how many objects were built, reused, taken back and let go because the pool was full
+        self.stats = {
+            'created': 0,
+            'reused': 0,
+            'released': 0,
+            'dropped': 0
+        }
+
+    def acquire(self, *args, **kwargs):
+        """ Returns a free object set up with the arguments, building a new one if there is none. """
+        if self.free:
+            obj = self.free.pop()
+            obj.spawn(*args, **kwargs)
+            self.stats['reused'] += 1
+        else:
+            obj = self.factory(*args, **kwargs)
+            self.stats['created'] += 1
+
+        obj.pool = self
+        obj.released = False
+
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return obj
+
+    def release(self, obj):
+        """ Takes back an object handed out by this pool. Anything else, or anything taken back already, is ignored. """
+        if getattr(obj, 'pool', None) is not self or obj.released:
+            return
+
+        obj.released = True
+        self.in_use -= 1
+        self.stats['released'] += 1
+
+        # never hold more objects than have been needed at once
+        if self.in_use + len(self.free) < max(self.capacity, self.peak):
+            self.free.append(obj)
+        else:
+            self.stats['dropped'] += 1
+
+    def discard(self, obj):
+        """ Stops counting an object handed out by this pool as in use, without keeping it to be used again. """
+        if getattr(obj, 'pool', None) is not self or obj.released:
+            return
+
+        obj.released = True
+        self.in_use -= 1
+        self.stats['dropped'] += 1
+
+    def trim(self):
+        """ Shrinks the pool to the most that has been needed since it was last trimmed, and starts counting again. """
+        self.capacity = self.peak
+        keep = max(self.capacity - self.in_use, 0)
+        self.stats['dropped'] += max(len(self.free) - keep, 0)
+        del self.free[keep:]
+        self.peak = self.in_use
+
+    def report(self):
+        """ Returns the statistics of the pool along with its current size. """
+        return dict(self.stats, in_use=self.in_use, free=len(self.free), peak=self.peak, capacity=self.capacity)
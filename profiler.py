@@ -0,0 +1,134 @@
+import csv
+import json
+import time
+from array import array
+
+import pygame
+
+import constants
+import helper
+
+
+class FrameProfiler:
+    """ Times each phase of a frame into a ring buffer of the last few frames. Costs next to nothing while disabled. """
+    def __init__(self, size=constants.PROFILE_FRAMES):
+        # when the last phase ended
+        self.last = time.perf_counter()
+
+        self._enabled = False
+        self.overlay = False
+
+        # how many frames are kept
+        self.size = size
+
+        # phase -> seconds spent in it for each kept frame, in the order phases were first seen
+        self.phases = {}
+
+        # frames finished so far; the current frame is stored at frame % size
+        self.frame = 0
+
+        # lines of the overlay, only rendered again every few frames
+        self.overlay_surface = None
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        # time spent while disabled must not land in the first phase marked afterwards
+        if enabled and not self._enabled:
+            self.last = time.perf_counter()
+        self._enabled = enabled
+
+    def start(self):
+        """ Starts timing from now; the next mark covers everything since. """
+        if self.enabled:
+            self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """ Adds the time since the last mark to a phase of the current frame. """
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        times = self.phases.get(phase)
+        if times is None:
+            times = self.phases[phase] = array('d', bytes(8 * self.size))
+
+        times[self.frame % self.size] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        """ Moves on to the next frame, overwriting the oldest one once the buffer is full. """
+        if not self.enabled:
+            return
+
+        self.frame += 1
+        slot = self.frame % self.size
+        for times in self.phases.values():
+            times[slot] = 0.0
+
+    def toggle_overlay(self):
+        """ Shows or hides the overlay, profiling from then on if it was not already. """
+        self.overlay = not self.overlay
+        self.enabled = self.enabled or self.overlay
+        self.overlay_surface = None
+
+    def kept_frames(self):
+        """ Slots of the finished frames still in the buffer, oldest first. """
+        kept = min(self.frame, self.size)
+        return [frame % self.size for frame in range(self.frame - kept, self.frame)]
+
+    def averages(self):
+        """ Mean time of every phase over the kept frames, in ms. """
+        slots = self.kept_frames()
+        if not slots:
+            return {}
+
+        return {phase: sum(times[slot] for slot in slots) / len(slots) * 1000 for phase, times in self.phases.items()}
+
+    def draw(self, surface):
+        """ Draws the average time of every phase in the top left corner. """
+        if not self.overlay:
+            return
+
+        if self.overlay_surface is None or self.frame % constants.PROFILE_OVERLAY_INTERVAL == 0:
+            averages = self.averages()
+            lines = [('frame', sum(averages.values()))] + list(averages.items())
+
+            # rendered straight from the font, since the numbers change too often to be worth caching
+            font = helper.load_font(constants.FONTS_PATH + '8bitoperator.ttf', 12)
+            line_height = font.get_linesize()
+            width = 220
+            self.overlay_surface = pygame.Surface((width, line_height * len(lines) + 8), pygame.SRCALPHA)
+            self.overlay_surface.fill((0, 0, 0, 160))
+            for number, (phase, average) in enumerate(lines):
+                y = 4 + number * line_height
+                self.overlay_surface.blit(font.render(phase, True, pygame.color.Color('White')), (4, y))
+
+                # right aligned so that the numbers line up
+                value = font.render(f'{average:.2f} ms', True, pygame.color.Color('White'))
+                self.overlay_surface.blit(value, (width - 4 - value.get_width(), y))
+
+        surface.blit(self.overlay_surface, (0, 0))
+
+    def dump(self, path):
+        """ Writes the time of every phase of every kept frame, in ms, as JSON or otherwise CSV. """
+        slots = self.kept_frames()
+        first_frame = self.frame - len(slots)
+
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({
+                    'first_frame': first_frame,
+                    'frames': len(slots),
+                    'mean': self.averages(),
+                    'phases': {phase: [times[slot] * 1000 for slot in slots] for phase, times in self.phases.items()}
+                }, f, indent=2)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame'] + list(self.phases))
+                for frame, slot in enumerate(slots, first_frame):
+                    writer.writerow([frame] + [f'{times[slot] * 1000:.4f}' for times in self.phases.values()])
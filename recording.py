@@ -0,0 +1,129 @@
+import os
+import zlib
+import struct
+
+import constants
+
+
+# layout of a recording: header, then a record for every frame, then an end marker and the outcome of the session
+RECORDING_MAGIC = b'TYPEITRC'
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct('<8sIQd?')  # magic, version, seed, step time, entity engine
+FRAME = struct.Struct('<HB')  # ms since the last frame, length of the keys pressed during it
+OUTCOME = struct.Struct('<IdqdIiI')  # frames, ticks, score, multiplier, kills, health, digest of the sprites
+OUTCOME_FIELDS = ('frames', 'ticks', 'score', 'multiplier', 'kills', 'health', 'digest')
+
+# marks the end of the frames in place of a frame time; longer frames are cut short by the game anyway
+END_OF_FRAMES = 0xFFFF
+
+# keys that are not typed characters are stored as control characters
+KEY_CODES = {
+    'backspace': '\b',
+    'return': '\r'
+}
+CODE_KEYS = {code: key for key, code in KEY_CODES.items()}
+
+
+def new_seed():
+    """ A random seed for a session that can be recorded. """
+    return int.from_bytes(os.urandom(8), 'little')
+
+
+def encode_keys(keys):
+    return ''.join(KEY_CODES.get(key, key) for key in keys).encode('utf-8')
+
+
+def decode_keys(data):
+    return [CODE_KEYS.get(character, character) for character in data.decode('utf-8')]
+
+
+def outcome(display, frames):
+    """ What a session ended with, down to where every enemy and projectile is. """
+    sprites = sorted((type(sprite).__name__, tuple(sprite.rect), sprite.word)
+                     for sprite in list(display.enemies) + list(display.projectiles))
+    return dict(zip(OUTCOME_FIELDS, (frames, display.ticks, display.score_text, display.score_multiplier_text,
+                                     display.player.enemies_killed, display.player.health,
+                                     zlib.crc32(repr(sprites).encode('utf-8')))))
+
+
+class Recorder:
+    """
+    Writes everything a session depends on to a file as it is played: the seed of 'random',
+    how long every frame took and the keys pressed during it. Replaying it runs the exact same game.
+    """
+    def __init__(self, path, seed, entity_engine=constants.ENTITY_ENGINE):
+        self.file = open(path, 'wb')
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, seed, constants.STEP_TIME, entity_engine))
+
+        # keys pressed since the last frame was written
+        self.keys = []
+
+        self.frames = 0
+
+    def key(self, key):
+        """ Remembers a key handed to Display.press_key, to be written with the frame it was pressed in. """
+        self.keys.append(key)
+
+    def frame(self, frame_time):
+        """ Writes a frame that took 'frame_time' ms, as given by the clock, along with the keys pressed during it. """
+        data = b''
+        for key in self.keys:
+            key_data = encode_keys([key])
+
+            # keys that do not fit in one frame go in frames that take no time before it, which plays out the same
+            if len(data) + len(key_data) > 0xFF:
+                self.file.write(FRAME.pack(0, len(data)) + data)
+                self.frames += 1
+                data = b''
+            data += key_data
+        self.keys = []
+
+        self.file.write(FRAME.pack(min(int(frame_time), END_OF_FRAMES - 1), len(data)) + data)
+        self.frames += 1
+
+    def close(self, display):
+        """ Ends the recording with the outcome of the session, for a replay to be checked against. """
+        # keys pressed after the last frame still count
+        if self.keys:
+            self.frame(0)
+
+        result = outcome(display, self.frames)
+        self.file.write(FRAME.pack(END_OF_FRAMES, 0))
+        self.file.write(OUTCOME.pack(*(result[field] for field in OUTCOME_FIELDS)))
+        self.file.close()
+
+
+class Recording:
+    """ A recorded session read back from a file. """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, self.seed, self.step_time, self.entity_engine = RECORDING_HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f'{path} is not a recording this version of the game can replay')
+
+        # (ms since the last frame, keys pressed during it) for every frame
+        self.frames = []
+
+        # what the session ended with, if the game was closed properly
+        self.outcome = None
+
+        offset = RECORDING_HEADER.size
+        while offset + FRAME.size <= len(data):
+            frame_time, length = FRAME.unpack_from(data, offset)
+            offset += FRAME.size
+            if frame_time == END_OF_FRAMES:
+                if offset + OUTCOME.size <= len(data):
+                    self.outcome = dict(zip(OUTCOME_FIELDS, OUTCOME.unpack_from(data, offset)))
+                break
+
+            # a session that crashed may have been cut off in the middle of a frame
+            if offset + length > len(data):
+                break
+
+            self.frames.append((frame_time, decode_keys(data[offset:offset + length])))
+            offset += length
+
+    def __len__(self):
+        return len(self.frames)
@@ -0,0 +1,58 @@
+import sys
+import json
+import time
+import platform
+
+import pygame
+
+
+def percentile(samples, fraction):
+    """ Nearest-rank percentile of already sorted samples. """
+    index = min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize_times(samples):
+    """ Per-frame timings in ms. """
+    samples = sorted(samples)
+    return {
+        'p50': percentile(samples, 0.50) * 1000,
+        'p95': percentile(samples, 0.95) * 1000,
+        'p99': percentile(samples, 0.99) * 1000,
+        'mean': sum(samples) / len(samples) * 1000,
+        'max': samples[-1] * 1000
+    }
+
+
+def summarize_outcomes(samples):
+    """ Spread of one stat over the sessions played with a set of parameters. """
+    samples = sorted(samples)
+    return {
+        'mean': sum(samples) / len(samples),
+        'p10': percentile(samples, 0.10),
+        'p50': percentile(samples, 0.50),
+        'p90': percentile(samples, 0.90),
+        'min': samples[0],
+        'max': samples[-1]
+    }
+
+
+def meta(**settings):
+    """ What a run was made on and with, for telling results apart later. """
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        **settings,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def write(results, path):
+    """ Writes results as JSON to the path, or to stdout if it is '-'. """
+    if path == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
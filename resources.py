@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame
+
+import constants
+
+
+# how a decoded image is converted to the display format
+CONVERSIONS = ('alpha', 'opaque', 'colorkey')
+
+# images with this color are see-through when loaded with the 'colorkey' conversion
+COLORKEY = pygame.color.Color('White')
+
+# (path, conversion) -> converted surface
+images = {}
+
+# (path, conversion) -> handle of an image still being decoded
+pending = {}
+
+# decodes images on worker threads; started the first time it is needed
+executor = None
+
+# the asset pack, if one has been built; opened the first time an image is loaded
+pack = None
+pack_opened = False
+
+# how often the cache is hit or missed, and how many bytes of pixels it holds
+stats = {
+    'hits': 0,
+    'misses': 0,
+    'bytes': 0
+}
+
+
+# layout of the asset pack: header, table of contents as JSON, then the raw pixels of every image
+PACK_MAGIC = b'TYPEITPK'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<8sII')  # magic, version, length of the table of contents
+PACK_ALIGNMENT = 16
+
+# folders and files that go into the pack, with the pixel format they are stored in;
+# 'RGB' is used for images that are colorkeyed, so their alpha is never needed
+PACKED_FOLDERS = (
+    (constants.KNIGHT_IDLE_PATH, 'RGB'),
+    (constants.KNIGHT_WALK_PATH, 'RGB'),
+    (constants.KNIGHT_ATTACK_PATH, 'RGB'),
+    (constants.KNIGHT_DEATH_PATH, 'RGB'),
+    (constants.MELEE_SKELETON_WALK_PATH, 'RGB'),
+    (constants.MELEE_SKELETON_ATTACK_PATH, 'RGB'),
+    (constants.MELEE_SKELETON_DEATH_PATH, 'RGB'),
+    (constants.RANGED_SKELETON_WALK_PATH, 'RGB'),
+    (constants.RANGED_SKELETON_ATTACK_PATH, 'RGB'),
+    (constants.RANGED_SKELETON_DEATH_PATH, 'RGB'),
+    (constants.CASTLE_BACKGROUND_PATH, 'RGBA'),
+    (constants.FOREST_BACKGROUND_PATH, 'RGBA'),
+    (constants.CRYPTS_BACKGROUND_PATH, 'RGBA'),
+    (constants.IMAGES_PATH, 'RGBA')
+)
+PACKED_FILES = (
+    (constants.ICON_PATH, 'RGBA'),
+)
+
+
+def pack_name(path):
+    """ Name of a file or folder in the asset pack: its path from the game folder, with forward slashes. """
+    return os.path.relpath(path, constants.DIRECTORY_PATH).replace(os.sep, '/')
+
+
+def align(position):
+    return -(-position // PACK_ALIGNMENT) * PACK_ALIGNMENT
+
+
+class AssetPack:
+    """ A built asset pack, memory-mapped so that images are made straight from its pixels. """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, contents_length = PACK_HEADER.unpack_from(self.map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f'{path} is not a version {PACK_VERSION} asset pack, build it again with resources.py')
+
+        # name -> where the pixels start, the size of the image and the pixel format
+        self.contents = json.loads(self.map[PACK_HEADER.size:PACK_HEADER.size + contents_length].decode('utf-8'))
+        self.data_start = align(PACK_HEADER.size + contents_length)
+        self.view = memoryview(self.map)
+
+        # folder -> names of the files in it, sorted
+        self.folders = {}
+        for name in sorted(self.contents):
+            folder, _, file_name = name.rpartition('/')
+            self.folders.setdefault(folder, []).append(file_name)
+
+    def __contains__(self, path):
+        return pack_name(path) in self.contents
+
+    def decode(self, path):
+        """ Makes a surface straight from the packed pixels, without decoding a PNG. """
+        entry = self.contents[pack_name(path)]
+        width, height = entry['size']
+        start = self.data_start + entry['offset']
+        return pygame.image.frombuffer(self.view[start:start + width * height * len(entry['format'])],
+                                       (width, height), entry['format'])
+
+    def listdir(self, folder):
+        """ Returns the names of the files in a packed folder, or None if the folder is not packed. """
+        return self.folders.get(pack_name(folder))
+
+
+def pack_is_current(path):
+    """
+    Whether the asset pack is newer than every image and folder that went into it, as far as they are still there.
+    Editing an image changes its time and adding or removing one changes the time of its folder.
+    """
+    built = os.path.getmtime(path)
+
+    sources = [file_path for file_path, _ in PACKED_FILES]
+    for folder, _ in PACKED_FOLDERS:
+        if os.path.isdir(folder):
+            sources.append(folder)
+            sources.extend(folder + name for name in os.listdir(folder) if name.endswith('.png'))
+
+    return all(os.path.getmtime(source) <= built for source in sources if os.path.exists(source))
+
+
+def get_pack():
+    """ Returns the asset pack if one has been built since the images last changed, opening it the first time. """
+    global pack, pack_opened
+    if not pack_opened:
+        pack_opened = True
+        if os.path.exists(constants.ASSET_PACK_PATH) and pack_is_current(constants.ASSET_PACK_PATH):
+            pack = AssetPack(constants.ASSET_PACK_PATH)
+
+    return pack
+
+
+def decode(path):
+    """ Decodes an image, taking it from the asset pack if it is in there. """
+    asset_pack = get_pack()
+    if asset_pack is not None and path in asset_pack:
+        return asset_pack.decode(path)
+
+    return pygame.image.load(path)
+
+
+def list_images(folder):
+    """ Returns the names of the images in a folder, sorted, from the asset pack if the folder is in there. """
+    asset_pack = get_pack()
+    names = asset_pack.listdir(folder) if asset_pack is not None else None
+    if names is None:
+        names = sorted(os.listdir(folder))
+
+    return names
+
+
+def build_pack(destination=None):
+    """ Packs the raw pixels of every image the game loads into one file with a table of contents. """
+    destination = destination or constants.ASSET_PACK_PATH
+
+    files = [(path, pixel_format) for path, pixel_format in PACKED_FILES]
+    for folder, pixel_format in PACKED_FOLDERS:
+        files.extend((folder + name, pixel_format) for name in sorted(os.listdir(folder)) if name.endswith('.png'))
+
+    contents = {}
+    pixels = []
+    offset = 0
+    for path, pixel_format in files:
+        image = pygame.image.load(path)
+        data = pygame.image.tostring(image, pixel_format)
+
+        contents[pack_name(path)] = {'offset': offset, 'size': list(image.get_size()), 'format': pixel_format}
+        pixels.append(data)
+        offset = align(offset + len(data))
+
+    contents_data = json.dumps(contents, sort_keys=True).encode('utf-8')
+    data_start = align(PACK_HEADER.size + len(contents_data))
+
+    with open(destination, 'wb') as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(contents_data)))
+        f.write(contents_data)
+        f.write(bytes(data_start - f.tell()))
+        for data in pixels:
+            f.write(data)
+            f.write(bytes(align(len(data)) - len(data)))
+
+    return destination, len(files)
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+def convert(surface, conversion):
+    """ Converts a decoded image to the display format. Needs the display to be set. """
+    if conversion == 'alpha':
+        return surface.convert_alpha()
+
+    converted = surface.convert()
+    if conversion == 'colorkey':
+        converted.set_colorkey(COLORKEY)
+
+    return converted
+
+
+def store(key, image):
+    """ Adds a converted image to the cache. """
+    images[key] = image
+    stats['bytes'] += surface_bytes(image)
+    return image
+
+
+class ImageHandle:
+    """ An image that may still be decoding on a worker thread. Converting it is left to the main thread. """
+    def __init__(self, path, conversion, future=None, image=None):
+        self.key = (path, conversion)
+        self.future = future
+
+        # the converted image once there is one, kept so that evicting it from the cache cannot lose it
+        self.image = image
+
+    def done(self):
+        """ Whether result() can return without waiting. """
+        return self.image is not None or self.key in images or self.future.done()
+
+    def result(self):
+        """ Waits for the image to decode, then converts and caches it. Must be called on the main thread. """
+        if self.image is None:
+            image = images.get(self.key)
+            if image is None:
+                decoded = self.future.result()
+                pending.pop(self.key, None)
+                image = store(self.key, convert(decoded, self.key[1]))
+            self.image = image
+
+        return self.image
+
+
+def check_conversion(conversion):
+    if conversion not in CONVERSIONS:
+        raise ValueError(f"unknown conversion '{conversion}', choose from {', '.join(CONVERSIONS)}")
+
+
+def load_image_async(path, conversion='alpha'):
+    """ Starts decoding the image at the path on a worker thread and returns a handle to wait on. """
+    global executor
+    check_conversion(conversion)
+
+    key = (path, conversion)
+    image = images.get(key)
+    if image is not None:
+        stats['hits'] += 1
+        return ImageHandle(path, conversion, image=image)
+
+    # already being decoded
+    if key in pending:
+        stats['hits'] += 1
+        return pending[key]
+
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=constants.ASSET_WORKERS, thread_name_prefix='assets')
+
+    stats['misses'] += 1
+
+    # packed images need no decoding, so there is nothing to do on a worker thread
+    asset_pack = get_pack()
+    if asset_pack is not None and path in asset_pack:
+        future = Future()
+        future.set_result(asset_pack.decode(path))
+    else:
+        future = executor.submit(pygame.image.load, path)
+
+    handle = ImageHandle(path, conversion, future)
+    pending[key] = handle
+    return handle
+
+
+def load_image(path, conversion='alpha'):
+    """
+    Returns the image at the path converted to the display format, only loading it the first time.
+    The surface is shared by everything that loads the same image, so it must be copied before being drawn on.
+    """
+    check_conversion(conversion)
+
+    key = (path, conversion)
+    image = images.get(key)
+
+    if image is not None:
+        stats['hits'] += 1
+    elif key in pending:
+        # already being decoded, so wait for it rather than decoding it twice
+        stats['hits'] += 1
+        image = pending[key].result()
+    else:
+        stats['misses'] += 1
+        image = store(key, convert(decode(path), conversion))
+
+    return image
+
+
+def evict(path):
+    """ Forgets every conversion of the image at the path. """
+    for conversion in CONVERSIONS:
+        image = images.pop((path, conversion), None)
+        if image is not None:
+            stats['bytes'] -= surface_bytes(image)
+
+
+def report():
+    """ Returns the cache statistics along with the number of images held. """
+    return dict(stats, images=len(images))
+
+
+def load_everything():
+    """ Loads every image that goes into the asset pack the way the game does, and returns how long it took. """
+    images.clear()
+    pending.clear()
+    stats['bytes'] = 0
+
+    start = time.perf_counter()
+    for folder, pixel_format in PACKED_FOLDERS:
+        conversion = 'colorkey' if pixel_format == 'RGB' else 'alpha'
+        for name in list_images(folder):
+            load_image(folder + name, conversion)
+
+    for path, pixel_format in PACKED_FILES:
+        load_image(path)
+
+    return time.perf_counter() - start
+
+
+def compare(repeats):
+    """ Compares how long loading every image takes from loose files and from the asset pack. """
+    global pack, pack_opened
+
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    pygame.display.set_mode((constants.SCREEN_WIDTH, constants.SCREEN_HEIGHT))
+
+    if get_pack() is None:
+        sys.exit(f'no up to date asset pack at {constants.ASSET_PACK_PATH}, build it first')
+
+    results = {}
+    for name, use_pack in (('loose', False), ('pack', True)):
+        times = []
+        for _ in range(repeats):
+            # open the pack again every time, so that opening it counts too
+            pack, pack_opened = None, not use_pack
+            times.append(load_everything())
+
+        results[name] = min(times)
+        print(f'{name:<6} {results[name] * 1000:8.1f} ms (best of {repeats})')
+
+    print(f"pack is {results['loose'] / results['pack']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds the asset pack, or compares loading from it with loading loose files.')
+    parser.add_argument('command', choices=('build', 'compare'))
+    parser.add_argument('--output', help='where to write the asset pack when building')
+    parser.add_argument('--repeats', type=int, default=5, help='how many times to load everything when comparing')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        destination, count = build_pack(args.output)
+        print(f'packed {count} images into {destination} ({os.path.getsize(destination) / 2 ** 20:.1f} MiB) '
+              f'in {time.perf_counter() - start:.2f} s')
+    else:
+        compare(args.repeats)
@@ -0,0 +1,437 @@
+import os
+import sys
+import mmap
+import time
+import random
+import bisect
+import struct
+from array import array
+
+import constants
+
+
+# layout of compiled word lists: header, words sorted by length and each followed by a newline,
+# the offset of every word, then where each length starts
+COMPILED_MAGIC = b'TYPEITWL'
+COMPILED_VERSION = 2
+COMPILED_HEADER = struct.Struct('<8sIQQQ')  # magic, version, word count, where the offsets start, where the lengths start
+COMPILED_OFFSET = struct.Struct('<Q')
+COMPILED_OFFSETS = struct.Struct('<QQ')  # where a word starts and where the next one starts
+COMPILED_BUCKET_COUNT = struct.Struct('<I')
+COMPILED_BUCKET = struct.Struct('<IQ')  # word length, index of the first word with that length
+
+
+class SortedWords:
+    """ Base class for word lists whose words are sorted by length. """
+    # every word length in the list, shortest first
+    lengths = []
+
+    # index of the first word of each length, followed by the number of words
+    bucket_starts = [0]
+
+    def span(self, lengths=None):
+        """ Returns the range of indices holding words within the (shortest, longest) lengths. """
+        if lengths is None:
+            return 0, len(self)
+
+        shortest, longest = lengths
+        first = bisect.bisect_left(self.lengths, shortest)
+        last = bisect.bisect_right(self.lengths, longest)
+        return self.bucket_starts[first], self.bucket_starts[last]
+
+    def sample(self, lengths=None):
+        """ Returns a random word, optionally only from words within the (shortest, longest) lengths. """
+        start, stop = self.span(lengths)
+        if start >= stop:
+            return None
+
+        return self[random.randrange(start, stop)]
+
+
+class WordList(SortedWords):
+    """ Every word of a tier, stored as one string plus where each word starts in it. """
+    def __init__(self, path):
+        with open(path, 'r') as f:
+            contents_of_file = f.read()
+
+        # blank lines would give enemies an empty word
+        lines = sorted((line for line in contents_of_file.splitlines() if line), key=len)
+
+        # each word is followed by a newline, so a word ends one character before the next one starts
+        self.text = '\n'.join(lines) + '\n'
+        self.offsets = array('L', [0])
+        self.lengths = []
+        self.bucket_starts = []
+        for index, line in enumerate(lines):
+            self.offsets.append(self.offsets[-1] + len(line) + 1)
+
+            if not self.lengths or self.lengths[-1] != len(line):
+                self.lengths.append(len(line))
+                self.bucket_starts.append(index)
+
+        self.bucket_starts.append(len(lines))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.text[self.offsets[index]:self.offsets[index + 1] - 1]
+
+
+class MappedWordList(SortedWords):
+    """ A compiled word list that is read straight from a memory-mapped file. """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count, self.index_start, buckets_start = COMPILED_HEADER.unpack_from(self.map, 0)
+        if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+            raise ValueError(f'{path} is not a version {COMPILED_VERSION} compiled word list, compile it again with words.py')
+
+        # there is one bucket per word length, so these stay small however many words there are
+        self.lengths = []
+        self.bucket_starts = []
+        bucket_count, = COMPILED_BUCKET_COUNT.unpack_from(self.map, buckets_start)
+        for length, start in COMPILED_BUCKET.iter_unpack(
+                self.map[buckets_start + COMPILED_BUCKET_COUNT.size:
+                         buckets_start + COMPILED_BUCKET_COUNT.size + bucket_count * COMPILED_BUCKET.size]):
+            self.lengths.append(length)
+            self.bucket_starts.append(start)
+
+        self.bucket_starts.append(self.count)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        # each word is followed by a newline, so a word ends one byte before the next one starts
+        start, end = COMPILED_OFFSETS.unpack_from(self.map, self.index_start + index * COMPILED_OFFSET.size)
+        return self.map[start:end - 1].decode('utf-8')
+
+
+def compiled_path(path):
+    """ Where the compiled form of a word list lives. """
+    return os.path.splitext(path)[0] + '.words'
+
+
+def compile_word_list(path, destination=None):
+    """ Turns a word list into a binary file of words sorted by length, the offset of every word and where each length starts. """
+    destination = destination or compiled_path(path)
+
+    # word length -> words of that length, in the order they appear in the file
+    buckets = {}
+    with open(path, 'r') as source:
+        for line in source:
+            word = line.rstrip('\r\n')
+            if word:
+                buckets.setdefault(len(word), []).append(word.encode('utf-8'))
+
+    offsets = array('Q', [COMPILED_HEADER.size])
+    bucket_table = []
+
+    with open(destination, 'wb') as compiled:
+        # the header is filled in once every word has been written
+        compiled.write(bytes(COMPILED_HEADER.size))
+
+        for length in sorted(buckets):
+            bucket_table.append(COMPILED_BUCKET.pack(length, len(offsets) - 1))
+            for word in buckets[length]:
+                compiled.write(word + b'\n')
+                offsets.append(offsets[-1] + len(word) + 1)
+
+        index_start = offsets[-1]
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        offsets.tofile(compiled)
+
+        buckets_start = compiled.tell()
+        compiled.write(COMPILED_BUCKET_COUNT.pack(len(bucket_table)))
+        compiled.write(b''.join(bucket_table))
+
+        compiled.seek(0)
+        compiled.write(COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, len(offsets) - 1, index_start, buckets_start))
+
+    return destination
+
+
+def open_word_list(path):
+    """ Opens the compiled form of a word list if it is up to date, otherwise reads the text file. """
+    compiled = compiled_path(path)
+    if os.path.exists(compiled) and \
+       (not os.path.exists(path) or os.path.getmtime(compiled) >= os.path.getmtime(path)):
+        return MappedWordList(compiled)
+
+    return WordList(path)
+
+
+class WordBank:
+    """ Loads every tier once and hands out random words. """
+    def __init__(self):
+        # tier filename -> word list
+        self.tiers = {}
+
+        # how long loading and sampling takes, in seconds, and how often a word clashed with a live one
+        self.stats = {
+            'loads': 0,
+            'load_time': 0.0,
+            'samples': 0,
+            'sample_time': 0.0,
+            'collisions': 0
+        }
+
+    def load(self, tier):
+        """ Loads a tier if it has not been loaded yet. """
+        if tier not in self.tiers:
+            start = time.perf_counter()
+            self.tiers[tier] = open_word_list(os.path.join(constants.DIRECTORY_PATH, tier))
+
+            self.stats['loads'] += 1
+            self.stats['load_time'] += time.perf_counter() - start
+
+        return self.tiers[tier]
+
+    def sample(self, tier, lengths=None, avoid=None):
+        """
+        Returns a random word from the tier, optionally only within the (shortest, longest) lengths.
+        Words that would be ambiguous to type next to the live words of the 'avoid' index are skipped;
+        None if every word of the tier is.
+        """
+        word_list = self.load(tier)
+
+        start = time.perf_counter()
+        word = word_list.sample(lengths)
+
+        # no words of those lengths, so use any length instead
+        if word is None:
+            word = word_list.sample()
+
+        # the tier has no words at all
+        if word is None:
+            return None
+
+        # live words are few compared to a tier, so this rarely takes more than one more try
+        attempts = 1
+        while avoid is not None and avoid.collides(word) and attempts < constants.WORD_SAMPLE_ATTEMPTS:
+            self.stats['collisions'] += 1
+            word = word_list.sample(lengths) or word_list.sample()
+            attempts += 1
+
+        # out of luck, so look through the words in order for one that is free, within the lengths first
+        if avoid is not None and avoid.collides(word):
+            self.stats['collisions'] += 1
+            word = self.probe(word_list, word_list.span(lengths), avoid)
+            if word is None and lengths is not None:
+                word = self.probe(word_list, word_list.span(), avoid)
+
+        self.stats['samples'] += 1
+        self.stats['sample_time'] += time.perf_counter() - start
+        return word
+
+    @staticmethod
+    def probe(word_list, span, avoid):
+        """ Returns the first word within the span, starting at a random one, that does not clash with a live word. """
+        start, stop = span
+        if start >= stop:
+            return None
+
+        offset = random.randrange(start, stop)
+        for index in range(stop - start):
+            word = word_list[start + (offset - start + index) % (stop - start)]
+            if not avoid.collides(word):
+                return word
+        return None
+
+    def metrics(self):
+        """ Returns the load and sample timings along with the size of every tier. """
+        metrics = dict(self.stats)
+        metrics['mean_sample_time'] = self.stats['sample_time'] / max(self.stats['samples'], 1)
+        metrics['tiers'] = {tier: len(word_list) for tier, word_list in self.tiers.items()}
+        return metrics
+
+
+class WordNode:
+    """ A single letter in the word index. """
+    __slots__ = ('children', 'count', 'entries')
+
+    def __init__(self):
+        # next letter -> node
+        self.children = {}
+
+        # how many live words go through this letter
+        self.count = 0
+
+        # everything whose word ends on this letter, oldest first
+        self.entries = []
+
+
+class WordIndex:
+    """ Trie of the words of everything on screen that can be typed at. """
+    def __init__(self):
+        self.root = WordNode()
+
+        # everything currently in the index
+        self.sprites = set()
+
+        # changes whenever a word is added or removed, so cursors know when to walk the trie again
+        self.version = 0
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, sprite):
+        """ Adds the word of a sprite. """
+        if sprite in self.sprites:
+            return
+
+        node = self.root
+        node.count += 1
+        for letter in sprite.word:
+            node = node.children.setdefault(letter, WordNode())
+            node.count += 1
+
+        node.entries.append(sprite)
+        self.sprites.add(sprite)
+        self.version += 1
+
+    def discard(self, sprite):
+        """ Removes the word of a sprite if it is in the index. """
+        if sprite not in self.sprites:
+            return
+
+        node = self.root
+        node.count -= 1
+        for letter in sprite.word:
+            child = node.children[letter]
+            child.count -= 1
+
+            # nothing else goes through this letter, so drop the rest of the branch
+            if child.count == 0:
+                del node.children[letter]
+                break
+
+            node = child
+        else:
+            node.entries.remove(sprite)
+
+        self.sprites.discard(sprite)
+        self.version += 1
+
+    def clear(self):
+        """ Removes every word. """
+        self.root = WordNode()
+        self.sprites.clear()
+        self.version += 1
+
+    def node(self, prefix):
+        """ Returns the node the prefix ends on, or None if no live word starts with it. """
+        node = self.root
+        for letter in prefix:
+            node = node.children.get(letter)
+            if node is None:
+                return None
+
+        return node
+
+    def collides(self, word):
+        """ Whether the word is a live word, starts with one, or is the start of one. """
+        node = self.root
+        for letter in word:
+            node = node.children.get(letter)
+            if node is None:
+                return False
+
+            # a live word is the start of this word
+            if node.entries:
+                return True
+
+        # this word is the start of a live word
+        return True
+
+    def find(self, word):
+        """ Returns everything whose word is exactly the given word, oldest first. """
+        node = self.node(word)
+        return node.entries if node else []
+
+    def words(self, prefix):
+        """ Yields every live word that starts with the prefix. """
+        stack = [(prefix, self.node(prefix))]
+        while stack:
+            word, node = stack.pop()
+            if node is None:
+                continue
+
+            if node.entries:
+                yield word
+
+            for letter, child in node.children.items():
+                stack.append((word + letter, child))
+
+    def cursor(self):
+        return PrefixCursor(self)
+
+
+class PrefixCursor:
+    """ Follows typed text through a word index one letter at a time. """
+    def __init__(self, index):
+        self.index = index
+        self.text = ''
+
+        # node reached after each typed letter, None once the text stops matching any live word
+        self.path = [index.root]
+        self.version = index.version
+
+    def walk(self):
+        """ Walks the whole text again after words were added or removed. """
+        self.path = [self.index.root]
+        for letter in self.text:
+            node = self.path[-1]
+            self.path.append(node.children.get(letter) if node else None)
+
+        self.version = self.index.version
+
+    def push(self, letter):
+        """ Follows one more typed letter. """
+        self.text += letter
+        if self.version != self.index.version:
+            self.walk()
+        else:
+            node = self.path[-1]
+            self.path.append(node.children.get(letter) if node else None)
+
+    def pop(self):
+        """ Goes back one letter. """
+        if not self.text:
+            return
+
+        self.text = self.text[:-1]
+        self.path.pop()
+
+    def clear(self):
+        self.text = ''
+        self.path = [self.index.root]
+        self.version = self.index.version
+
+    @property
+    def node(self):
+        if self.version != self.index.version:
+            self.walk()
+
+        return self.path[-1]
+
+    @property
+    def candidates(self):
+        """ How many live words start with the typed text. """
+        node = self.node
+        return node.count if node else 0
+
+
+# shared by everything that needs words
+bank = WordBank()
+
+
+if __name__ == '__main__':
+    # compile the given word lists, or every tier if none are given
+    for word_file in sys.argv[1:] or [os.path.join(constants.DIRECTORY_PATH, tier) for tier in constants.WORD_TIERS]:
+        start = time.perf_counter()
+        destination = compile_word_list(word_file)
+        print(f'{word_file} -> {destination} ({len(MappedWordList(destination))} words, {time.perf_counter() - start:.3f} s)')